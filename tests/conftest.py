@@ -1,5 +1,8 @@
 import os
 
+import pytest
+from django.test.utils import override_settings
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -33,6 +36,15 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+
+@pytest.fixture(autouse=True, scope='session')
+def _test_caches():
+    # Как core.runner.TestRunner для manage.py test
+    from core.runner import TEST_CACHES
+    with override_settings(CACHES=TEST_CACHES):
+        yield
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
@@ -0,0 +1,255 @@
+"""Кэш в файле SQLite в режиме WAL, общий для всех процессов хоста.
+
+LocMemCache живёт внутри процесса: у каждого воркера gunicorn свой
+кэш, и сброс версии лент в одном воркере не виден остальным. Этот
+бэкенд хранит записи в одном файле SQLite; WAL позволяет читать
+параллельно с записью, а запись идёт под BEGIN IMMEDIATE, поэтому
+incr атомарен между процессами.
+
+Размер ограничен MAX_ENTRIES: при переполнении удаляются просроченные
+записи, а затем 1/CULL_FREQUENCY давно не читавшихся (LRU по полю
+accessed). Время доступа обновляется не чаще ACCESS_RESOLUTION
+секунд на ключ, чтобы чтения не превращались в записи.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Ограничение SQLite на число параметров в одном запросе
+MAX_VARIABLES = 900
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+def _chunks(items, size=MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self._cull_check_interval = int(
+            options.get('CULL_CHECK_INTERVAL', 50))
+        self._local = threading.local()
+        self._writes = 0
+
+    # Соединения: своё на поток и процесс (после fork заново)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path,
+                                     timeout=self._busy_timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция записи, сразу берущая блокировку файла."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # Сериализация
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _prepare(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    # Чтение
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        key_map = {self._prepare(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        result = {}
+        stale = []
+        for chunk in _chunks(list(key_map)):
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                result[key_map[key]] = pickle.loads(value)
+                if now - accessed >= self._access_resolution:
+                    stale.append(key)
+        if stale:
+            with self._write() as connection:
+                for chunk in _chunks(stale):
+                    connection.execute(
+                        'UPDATE cache SET accessed = ? '
+                        f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                        [now, *chunk])
+        return result
+
+    def has_key(self, key, version=None):
+        key = self._prepare(key, version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    # Запись
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._prepare(key, version), self._dumps(value), expires, now)
+                for key, value in data.items()]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows)
+            self._maybe_cull(connection, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout),
+                 now))
+            self._maybe_cull(connection, 1)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare(key, version)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно между процессами: чтение и запись под одной блокировкой."""
+        key = self._prepare(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key))
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._prepare(key, version) for key in keys]
+        if not keys:
+            return
+        with self._write() as connection:
+            for chunk in _chunks(keys):
+                connection.execute(
+                    'DELETE FROM cache '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открытие файла дороже запроса
+        pass
+
+    # Ограничение размера
+
+    def _maybe_cull(self, connection, written):
+        # COUNT(*) в SQLite проходит индекс целиком, поэтому размер
+        # проверяется раз в CULL_CHECK_INTERVAL записей
+        self._writes += written
+        if self._writes < self._cull_check_interval:
+            return
+        self._writes = 0
+        self._cull(connection)
+
+    def _cull(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        if not self._cull_frequency:
+            # Как в Django: CULL_FREQUENCY = 0 очищает кэш целиком
+            excess = count
+        else:
+            excess = max(excess, count // self._cull_frequency)
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
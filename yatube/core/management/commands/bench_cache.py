@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def _write_keys(backend, keys):
+    for key in keys:
+        backend.set(key, key)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache: '
+            'время set/get/get_many/incr и долю попаданий для ключей, '
+            'записанных другими процессами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            backends = {
+                'locmem': LocMemCache('bench', {
+                    'OPTIONS': {'MAX_ENTRIES': options['keys'] * 3}}),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'),
+                    {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 3}}),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'),
+                    {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 3}}),
+            }
+            for name, backend in backends.items():
+                self._measure(name, backend, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _measure(self, name, backend, options):
+        keys = [f'key{number}' for number in range(options['keys'])]
+        timings = {}
+
+        started = time.perf_counter()
+        for key in keys:
+            backend.set(key, key)
+        timings['set'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for key in keys:
+            backend.get(key)
+        timings['get'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for start in range(0, len(keys), 10):
+            backend.get_many(keys[start:start + 10])
+        timings['get_many(10)'] = time.perf_counter() - started
+
+        backend.set('counter', 0)
+        started = time.perf_counter()
+        for _ in keys:
+            backend.incr('counter')
+        timings['incr'] = time.perf_counter() - started
+
+        # Ключи пишут дочерние процессы, читает родитель
+        shared = [f'shared{number}' for number in range(options['keys'])]
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_write_keys,
+                            args=(backend, shared[part::options['processes']]))
+            for part in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        hits = len(backend.get_many(shared))
+
+        per_op = ', '.join(
+            f'{operation} {seconds / len(keys) * 1e6:.1f} мкс'
+            for operation, seconds in timings.items())
+        self.stdout.write(
+            f'{name}: {per_op}; попаданий между процессами '
+            f'{hits / len(shared):.0%}')
@@ -0,0 +1,75 @@
+"""Бюджет SQL-запросов на представление.
+
+Представление объявляет бюджет декоратором query_budget, а
+QueryBudgetMiddleware в режиме DEBUG считает запросы за весь запрос
+(включая рендер шаблона) и пишет предупреждение при превышении.
+Тесты сверяются с тем же атрибутом, так что N+1 ломает сборку.
+
+Обращения к другим хранилищам (например, к хранилищу ключей
+sorl-thumbnail) код отмечает через record_lookups, а middleware
+выводит их в заголовках X-<Вид>-Lookups.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('yatube.query_budget')
+
+_lookups = threading.local()
+
+
+def query_budget(limit):
+    """Объявляет максимальное число SQL-запросов представления."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def record_lookups(kind, count=1):
+    """Учитывает обращения к хранилищу kind в текущем запросе."""
+    counts = getattr(_lookups, 'counts', None)
+    if counts is not None:
+        counts[kind] = counts.get(kind, 0) + count
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DEBUG:
+            return self.get_response(request)
+        counter = QueryCounter()
+        _lookups.counts = {}
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+            lookups = _lookups.counts
+        finally:
+            _lookups.counts = None
+        budget = getattr(request, 'query_budget', None)
+        response['X-Query-Count'] = counter.count
+        for kind, count in lookups.items():
+            response[f'X-{kind.title()}-Lookups'] = count
+        if budget is not None:
+            response['X-Query-Budget'] = budget
+            if counter.count > budget:
+                logger.warning(
+                    'Запросов к БД %s при бюджете %s: %s',
+                    counter.count, budget, request.path)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,111 @@
+"""Хранилище файлов, адресуемых содержимым.
+
+Файл сохраняется под SHA-256 своего содержимого с разбиением по
+вложенным каталогам: posts/ab/cd/abcd….jpg. Каталоги остаются
+небольшими при миллионах файлов, а одинаковые загрузки занимают место
+один раз. Хэш считается по ходу записи во временный файл, поэтому
+содержимое читается один раз.
+
+Один файл может принадлежать нескольким записям, поэтому удалять его
+через FieldFile.delete() нельзя.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Каталог недописанных файлов внутри хранилища: тот же диск, поэтому
+# готовый файл переносится атомарным os.replace
+INCOMING_DIR = '.incoming'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    hash_name = 'sha256'
+    # Ширина имён каталогов каждого уровня
+    fan_out = (2, 2)
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя зависит только от содержимого и выбирается в _save
+        return name
+
+    def content_name(self, name, digest):
+        """Имя файла name с хэшем digest: каталог и расширение от name."""
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        shards, start = [], 0
+        for width in self.fan_out:
+            shards.append(digest[start:start + width])
+            start += width
+        return posixpath.join(directory, *shards, digest + extension)
+
+    def is_addressed(self, name):
+        """Лежит ли файл уже под своим хэшем."""
+        parts = name.split('/')
+        digest = posixpath.splitext(parts[-1])[0]
+        if (len(parts) <= len(self.fan_out)
+                or not re.fullmatch(r'[0-9a-f]{64}', digest)):
+            return False
+        # Каталог до разбиения по хэшу
+        original = '/'.join(parts[:-len(self.fan_out) - 1] + [parts[-1]])
+        return name == self.content_name(original, digest)
+
+    def _incoming(self):
+        directory = self.path(INCOMING_DIR)
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.mkstemp(dir=directory)
+
+    def _place(self, source_path, name, link=False):
+        """Переносит (или связывает жёсткой ссылкой) файл на место name.
+
+        Если такой файл уже есть, это дубликат: источник не нужен.
+        """
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if os.path.exists(full_path):
+            if not link:
+                os.remove(source_path)
+            return
+        if link:
+            try:
+                os.link(source_path, full_path)
+            except FileExistsError:
+                return
+        else:
+            os.replace(source_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def _save(self, name, content):
+        descriptor, incoming_path = self._incoming()
+        digest = hashlib.new(self.hash_name)
+        try:
+            with os.fdopen(descriptor, 'wb') as incoming:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    incoming.write(chunk)
+            name = self.content_name(name, digest.hexdigest())
+            self._place(incoming_path, name)
+        except BaseException:
+            if os.path.exists(incoming_path):
+                os.remove(incoming_path)
+            raise
+        return name
+
+    def adopt(self, name):
+        """Связывает уже лежащий в хранилище файл с его адресом.
+
+        Исходный файл не трогается: его удаляют после того, как ссылки
+        в БД переключены на новое имя. Возвращает новое имя.
+        """
+        digest = hashlib.new(self.hash_name)
+        with self.open(name) as file:
+            for chunk in file.chunks():
+                digest.update(chunk)
+        new_name = self.content_name(name, digest.hexdigest())
+        self._place(self.path(name), new_name, link=True)
+        return new_name
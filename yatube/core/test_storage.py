@@ -0,0 +1,46 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_name_is_sharded_content_hash(self):
+        digest = hashlib.sha256(b'picture').hexdigest()
+        name = self.storage.save('posts/photo.JPG', ContentFile(b'picture'))
+        self.assertEqual(
+            name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertTrue(self.storage.is_addressed(name))
+        self.assertFalse(self.storage.is_addressed('posts/photo.jpg'))
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'picture')
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            os.listdir(self.storage.path('.incoming')), [])
+
+    def test_adopt_links_existing_file(self):
+        with open(os.path.join(self.directory, 'legacy.gif'), 'wb') as file:
+            file.write(b'legacy')
+        name = self.storage.adopt('legacy.gif')
+        self.assertTrue(self.storage.is_addressed(name))
+        self.assertTrue(self.storage.exists('legacy.gif'))
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'legacy')
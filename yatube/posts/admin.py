@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment, Follow
+from .models import Group, Post, Comment, Follow, TimelineEntry
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -31,7 +31,14 @@ class FollowAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class TimelineEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'post', 'author', 'pub_date')
+    list_filter = ('pub_date',)
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(TimelineEntry, TimelineEntryAdmin)
@@ -0,0 +1,236 @@
+"""JSON API только для чтения: посты, комментарии, группы и подписки.
+
+Списки строятся на тех же запросах и индексах, что и ленты, и листаются
+курсором (CursorPaginator). Объекты моделей не создаются: строки
+читаются через values() ровно с теми колонками, что попросил клиент
+в ?fields=, плюс ключ курсора. ?expand=author,group заменяет id связи
+объектом; связи читаются через posts.loaders, одним in_bulk на модель.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.middleware import query_budget
+
+from . import loaders
+from .models import Comment, Follow, Group, Post
+from .paginators import CursorPaginator
+from .threads import REPLY_ORDERING
+
+User = get_user_model()
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def _user(user):
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def _group(group):
+    return {'id': group.pk, 'slug': group.slug, 'title': group.title}
+
+
+def _datetime(value):
+    return value.isoformat() if value else None
+
+
+def _image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+# Поле API: (колонка values(), преобразование значения)
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _datetime),
+    'author': ('author_id', None),
+    'group': ('group_id', None),
+    'image': ('image', _image_url),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'post': ('post_id', None),
+    'author': ('author_id', None),
+    'parent': ('parent_id', None),
+    'depth': ('depth', None),
+    'text': ('text', None),
+    'created': ('created', _datetime),
+}
+GROUP_FIELDS = {
+    'id': ('id', None),
+    'slug': ('slug', None),
+    'title': ('title', None),
+    'description': ('description', None),
+}
+FOLLOW_FIELDS = {
+    'id': ('id', None),
+    'user': ('user_id', None),
+    'author': ('author_id', None),
+}
+# Какие поля можно раскрыть: модель связи и её вид в ответе
+POST_EXPAND = {'author': (User, _user), 'group': (Group, _group)}
+COMMENT_EXPAND = {'author': (User, _user)}
+FOLLOW_EXPAND = {'user': (User, _user), 'author': (User, _user)}
+
+
+def _names(request, parameter, available, default):
+    raw = request.GET.get(parameter)
+    if raw is None:
+        return list(default)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ApiError(f'Неизвестные значения {parameter}: '
+                       f'{", ".join(unknown)}')
+    return names
+
+
+def _requested(request, fields, expand):
+    """Поля ответа из ?fields= и раскрываемые связи из ?expand=."""
+    names = _names(request, 'fields', fields, fields)
+    expanded = _names(request, 'expand', expand, ())
+    return names + [name for name in expanded if name not in names], expanded
+
+
+def _columns(names, fields, ordering=()):
+    columns = {fields[name][0] for name in names}
+    # Ключ курсора читается всегда, даже если клиент его не просил
+    columns |= {'id' if field.lstrip('-') == 'pk' else field.lstrip('-')
+                for field in ordering}
+    return columns
+
+
+def _serialize(request, rows, names, expanded, fields, expand):
+    """Строки values() в словари API с раскрытыми связями.
+
+    Связи всех раскрываемых полей собираются в общий Loader запроса:
+    user и author подписок читаются одним запросом.
+    """
+    loader = loaders.for_request(request)
+    for name in expanded:
+        column = fields[name][0]
+        loader.want(expand[name][0], (row[column] for row in rows))
+    loader.resolve()
+    results = []
+    for row in rows:
+        item = {}
+        for name in names:
+            column, convert = fields[name]
+            value = row[column]
+            if name in expanded:
+                model, present = expand[name]
+                related = loader.get(model, value)
+                value = present(related) if related is not None else None
+            elif convert is not None:
+                value = convert(value)
+            item[name] = value
+        results.append(item)
+    return results
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def _list(request, queryset, fields, expand, ordering):
+    names, expanded = _requested(request, fields, expand)
+    paginator = CursorPaginator(
+        queryset.values(*_columns(names, fields, ordering)),
+        _page_size(request), ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    results = _serialize(request, list(page), names, expanded,
+                         fields, expand)
+    return {
+        'results': results,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def _detail(request, queryset, fields, expand):
+    names, expanded = _requested(request, fields, expand)
+    row = queryset.values(*_columns(names, fields)).first()
+    if row is None:
+        raise ApiError('Не найдено', HTTPStatus.NOT_FOUND)
+    return _serialize(request, [row], names, expanded, fields, expand)[0]
+
+
+def api_view(view_func):
+    """Представление API: GET, бюджет запросов, ошибки в JSON."""
+    @query_budget(settings.QUERY_BUDGETS['api'])
+    @require_GET
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        try:
+            return JsonResponse(view_func(request, *args, **kwargs))
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+    return wrapped
+
+
+@api_view
+def posts(request):
+    queryset = Post.objects.all()
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return _list(request, queryset, POST_FIELDS, POST_EXPAND,
+                 ('-pub_date', '-pk'))
+
+
+@api_view
+def post(request, post_id):
+    return _detail(request, Post.objects.filter(pk=post_id),
+                   POST_FIELDS, POST_EXPAND)
+
+
+@api_view
+def post_comments(request, post_id):
+    # Ветки в порядке обхода в глубину, по индексу (post, path)
+    return _list(request, Comment.objects.filter(post_id=post_id),
+                 COMMENT_FIELDS, COMMENT_EXPAND, REPLY_ORDERING)
+
+
+@api_view
+def groups(request):
+    return _list(request, Group.objects.all(), GROUP_FIELDS, {},
+                 ('slug',))
+
+
+@api_view
+def group(request, slug):
+    return _detail(request, Group.objects.filter(slug=slug),
+                   GROUP_FIELDS, {})
+
+
+@api_view
+def follows(request):
+    if 'user' in request.GET:
+        queryset = Follow.objects.filter(
+            user__username=request.GET['user'])
+    elif 'author' in request.GET:
+        queryset = Follow.objects.filter(
+            author__username=request.GET['author'])
+    else:
+        raise ApiError('Нужен параметр user или author')
+    return _list(request, queryset, FOLLOW_FIELDS, FOLLOW_EXPAND, ('-pk',))
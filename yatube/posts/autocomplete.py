@@ -0,0 +1,154 @@
+"""Автодополнение имён авторов и адресов групп по префиксу.
+
+Каждый процесс держит в памяти отсортированные массивы ключей и ищет
+префикс через bisect: поиск стоит O(log n) и не делает LIKE-запросов.
+Массивы строятся из БД при первом обращении, а дальше меняются по
+журналу в общем кэше: обработчики сигналов User и Group после
+фиксации транзакции увеличивают версию и кладут изменение под её
+номером. Процесс, отставший по версии, применяет недостающие записи;
+если часть журнала уже вытеснена или кэш очищен — строит всё заново.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import Group
+
+User = get_user_model()
+
+VERSION_KEY = 'posts:autocomplete:version'
+CHANGE_KEY = 'posts:autocomplete:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+# Длиннее журнал дешевле построить заново, чем применять
+MAX_REPLAY = 1000
+
+
+class PrefixIndex:
+    """Отсортированный массив (ключ, значение) с поиском по префиксу.
+
+    Ключи хранятся в нижнем регистре в отдельном списке для bisect;
+    _keys_by_pk позволяет убрать старый ключ при переименовании.
+    """
+
+    def __init__(self, items=()):
+        entries = sorted((key.lower(), pk, value) for pk, key, value in items)
+        self._keys = [key for key, _, _ in entries]
+        self._pks = [pk for _, pk, _ in entries]
+        self._values = [value for _, _, value in entries]
+        self._keys_by_pk = dict(zip(self._pks, self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, pk, key, value):
+        self.remove(pk)
+        key = key.lower()
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._pks.insert(position, pk)
+        self._values.insert(position, value)
+        self._keys_by_pk[pk] = key
+
+    def remove(self, pk):
+        key = self._keys_by_pk.pop(pk, None)
+        if key is None:
+            return
+        position = bisect_left(self._keys, key)
+        while self._pks[position] != pk:
+            position += 1
+        del self._keys[position]
+        del self._pks[position]
+        del self._values[position]
+
+    def search(self, prefix, limit):
+        prefix = prefix.lower()
+        start = bisect_left(self._keys, prefix)
+        found = []
+        for position in range(start, min(start + limit, len(self._keys))):
+            if not self._keys[position].startswith(prefix):
+                break
+            found.append(self._values[position])
+        return found
+
+
+def _load():
+    users = User.objects.values_list('pk', 'username').iterator()
+    groups = Group.objects.values_list('pk', 'slug', 'title').iterator()
+    return {
+        'authors': PrefixIndex(
+            (pk, username, username) for pk, username in users),
+        'groups': PrefixIndex(
+            (pk, slug, (slug, title)) for pk, slug, title in groups),
+    }
+
+
+_lock = threading.Lock()
+_state = {'version': None, 'indexes': None}
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() — запись под блокировкой кэша; на каждом нажатии
+        # клавиши она не нужна, только когда ключа ещё нет
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def _sync():
+    version = _shared_version()
+    with _lock:
+        local = _state['version']
+        if local == version and _state['indexes'] is not None:
+            return _state['indexes']
+        if (_state['indexes'] is not None and local < version
+                and version - local <= MAX_REPLAY):
+            keys = [CHANGE_KEY.format(number)
+                    for number in range(local + 1, version + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                for key in keys:
+                    _apply(_state['indexes'], *changes[key])
+                _state['version'] = version
+                return _state['indexes']
+        # Первое обращение, кэш очищен или журнал неполон
+        _state['indexes'] = _load()
+        _state['version'] = version
+        return _state['indexes']
+
+
+def _apply(indexes, kind, pk, item):
+    if item is None:
+        indexes[kind].remove(pk)
+    else:
+        indexes[kind].add(*item)
+
+
+def record(kind, pk, entry=None):
+    """Добавляет изменение в общий журнал; entry=None — удаление."""
+    _shared_version()
+    version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), (kind, pk, entry), CHANGE_TIMEOUT)
+
+
+# Поля, от которых зависит запись индекса
+INDEXED_FIELDS = {'authors': {'username'}, 'groups': {'slug', 'title'}}
+
+
+def entry(kind, instance):
+    """Запись индекса kind для пользователя или группы."""
+    if kind == 'authors':
+        return instance.pk, instance.username, instance.username
+    return instance.pk, instance.slug, (instance.slug, instance.title)
+
+
+def suggest(prefix, limit):
+    """Авторы и группы, чьё имя или адрес начинается с prefix."""
+    indexes = _sync()
+    return {
+        'authors': indexes['authors'].search(prefix, limit),
+        'groups': indexes['groups'].search(prefix, limit),
+    }
@@ -0,0 +1,69 @@
+"""Версия лент для ключей фрагментного кэша.
+
+Версия входит в ключ {% cache %} каждой ленты и увеличивается при
+любой записи постов, комментариев и подписок, поэтому фрагменты можно
+хранить долго: после записи старые ключи просто перестают читаться.
+
+Карточки постов кэшируются отдельно, под ключом с версией самого
+поста, так что правка одного поста не трогает карточки остальных.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_MODIFIED_KEY = 'posts:feed_modified'
+
+
+def feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        # Стартуем с метки времени, а не с единицы: если ключ версии
+        # вытеснен раньше фрагментов, старые фрагменты не оживут.
+        cache.add(FEED_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def feed_modified():
+    """Время последней записи в ленты, в секундах эпохи."""
+    modified = cache.get(FEED_MODIFIED_KEY)
+    if modified is None:
+        # Ключ вытеснен, и когда была запись, неизвестно: считаем, что
+        # только что, иначе If-Modified-Since получил бы устаревший 304
+        cache.add(FEED_MODIFIED_KEY, time.time(), None)
+        modified = cache.get(FEED_MODIFIED_KEY)
+    return modified
+
+
+def bump_feed_version():
+    cache.set(FEED_MODIFIED_KEY, time.time(), None)
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        feed_version()
+
+
+def feed_cache_context():
+    """Переменные для {% cache %} в шаблонах лент."""
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': feed_version(),
+    }
+
+
+def post_card_key(post):
+    """Ключ карточки поста.
+
+    Версия — хэш всего, что выводится в карточке, поэтому правка
+    текста, смена группы или картинки дают новый ключ только этому
+    посту, без явного удаления старой записи.
+    """
+    author = post.author
+    parts = (post.text, post.pub_date.isoformat(), post.image.name,
+             post.group.slug if post.group_id else '',
+             author.username, author.get_full_name())
+    version = hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+    return f'posts:card:{post.pk}:{version}'
@@ -0,0 +1,100 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET n = n + 1 в той же
+транзакции, что и сама запись (обработчики в posts.signals), а
+reconcile() пересчитывает их пачками и исправляет расхождения.
+"""
+from django.conf import settings
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserCounter
+
+USER_COUNTERS = (
+    # (поле счётчика, queryset, по какому полю группировать)
+    ('posts_count', Post.objects, 'author_id'),
+    ('followers_count', Follow.objects, 'author_id'),
+    ('following_count', Follow.objects, 'user_id'),
+)
+
+
+def _count_for_users(user_ids):
+    """Настоящие значения счётчиков для пачки пользователей."""
+    actual = {user_id: {field: 0 for field, _, _ in USER_COUNTERS}
+              for user_id in user_ids}
+    for field, queryset, key in USER_COUNTERS:
+        rows = (queryset.filter(**{f'{key}__in': user_ids}).order_by()
+                .values(key).annotate(total=Count('pk')))
+        for row in rows:
+            actual[row[key]][field] = row['total']
+    return actual
+
+
+def for_user(user_id):
+    """Счётчики пользователя; отсутствующая строка считается заново."""
+    counter = UserCounter.objects.filter(user_id=user_id).first()
+    if counter is None:
+        counter, _ = UserCounter.objects.get_or_create(
+            user_id=user_id, defaults=_count_for_users([user_id])[user_id])
+    return counter
+
+
+def increment(user_id, field):
+    updated = UserCounter.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1})
+    if not updated:
+        # Строки ещё нет: создаём её с уже учтённой новой записью
+        for_user(user_id)
+
+
+def decrement(user_id, field):
+    # Строку не создаём: при удалении пользователя каскадом она уже
+    # удалена, а пересчитать можно командой reconcile_counters.
+    UserCounter.objects.filter(user_id=user_id, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1})
+
+
+def increment_comments(post_id, delta=1):
+    queryset = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        queryset = queryset.filter(comments_count__gt=0)
+    queryset.update(comments_count=F('comments_count') + delta)
+
+
+def reconcile_users(user_ids):
+    """Исправляет счётчики пачки пользователей, возвращает число правок."""
+    actual = _count_for_users(user_ids)
+    existing = UserCounter.objects.in_bulk(user_ids)
+    fields = [field for field, _, _ in USER_COUNTERS]
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    changed, missing = [], []
+    for user_id, values in actual.items():
+        counter = existing.get(user_id)
+        if counter is None:
+            missing.append(UserCounter(user_id=user_id, **values))
+        elif any(getattr(counter, name) != values[name] for name in fields):
+            if counter.followers_count > threshold >= values[
+                    'followers_count']:
+                # Как при отписке: автора раскладывает settle_timelines
+                counter.timeline_pull = True
+            for name in fields:
+                setattr(counter, name, values[name])
+            changed.append(counter)
+    UserCounter.objects.bulk_update(changed, [*fields, 'timeline_pull'])
+    UserCounter.objects.bulk_create(missing)
+    return len(changed) + len(missing)
+
+
+def reconcile_posts(post_ids):
+    """Исправляет comments_count пачки постов, возвращает число правок."""
+    actual = dict(
+        Comment.objects.filter(post_id__in=post_ids).order_by()
+        .values('post_id').annotate(total=Count('pk'))
+        .values_list('post_id', 'total'))
+    changed = []
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        total = actual.get(post.pk, 0)
+        if post.comments_count != total:
+            post.comments_count = total
+            changed.append(post)
+    Post.objects.bulk_update(changed, ['comments_count'])
+    return len(changed)
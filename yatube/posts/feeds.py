@@ -0,0 +1,118 @@
+"""RSS- и Atom-ленты постов: общая, группы и автора.
+
+Читалки опрашивают ленты часто, поэтому каждая лента обёрнута в
+freshness.conditional: пока постов не прибавилось и версия лент та же,
+ответ — 304 без запроса постов и рендера XML.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from core.middleware import query_budget
+
+from . import freshness
+from .models import Group, Post
+
+User = get_user_model()
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    link = reverse_lazy('posts:index')
+    description = 'Новые записи всех авторов'
+
+    def items(self):
+        return Post.objects.select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+    def item_title(self, post):
+        return truncatechars(post.text, 60)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.pk,))
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group else ()
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def description(self, group):
+        return group.description
+
+    def items(self, group):
+        return group.posts.select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def items(self, author):
+        return author.posts.select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupPostsFeed.description
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorPostsFeed.description
+
+
+def _view(feed, posts):
+    def view(request, *args, **kwargs):
+        response = feed(request, *args, **kwargs)
+        # Feed ставит Last-Modified по самой новой записи, а правки и
+        # удаления её не сдвигают: заголовок выставит conditional
+        del response['Last-Modified']
+        return response
+    budget = query_budget(settings.QUERY_BUDGETS['feeds'])
+    return budget(freshness.conditional(posts)(view))
+
+
+index_rss = _view(LatestPostsFeed(), freshness.index_posts)
+index_atom = _view(LatestPostsAtomFeed(), freshness.index_posts)
+group_rss = _view(GroupPostsFeed(), freshness.group_posts)
+group_atom = _view(GroupPostsAtomFeed(), freshness.group_posts)
+profile_rss = _view(AuthorPostsFeed(), freshness.profile_posts)
+profile_atom = _view(AuthorPostsAtomFeed(), freshness.profile_posts)
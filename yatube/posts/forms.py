@@ -5,6 +5,17 @@ from .models import Post, Comment
 
 
 class PostForm(ModelForm):
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ошибки, из-за которых ImageUploadHandler оборвал загрузку
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            self.add_error(field if field in self.fields else None, message)
+        return cleaned_data
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
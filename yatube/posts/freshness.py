@@ -0,0 +1,95 @@
+"""Свежесть лент для условных GET-запросов.
+
+В ETag входят самая новая pub_date ленты (один MAX по индексу
+(author/group, -pub_date, -id)) и версия лент из posts.cache, которую
+увеличивает любая запись постов, комментариев и подписок: правка и
+удаление поста дату не сдвигают вперёд, а версию меняют.
+
+Last-Modified по той же причине — не pub_date, а время последней
+записи из posts.cache. Дата в HTTP с точностью до секунды, поэтому
+в ту же секунду, что и запись, Last-Modified не отдаётся вовсе:
+иначе клиент, прочитавший ленту до записи, получил бы 304 после неё.
+Если ничего не изменилось, conditional отвечает 304 и представление
+не вызывает.
+
+HTML-ленты (conditional_page) так отвечают только гостям: страница
+гостя одна на всех, поэтому её можно отдать с публичным Cache-Control
+и переложить повторные запросы на CDN или обратный прокси.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import feed_modified, feed_version
+from .models import Post
+
+
+def index_posts(request):
+    return Post.objects.all()
+
+
+def group_posts(request, slug):
+    return Post.objects.filter(group__slug=slug)
+
+
+def profile_posts(request, username):
+    return Post.objects.filter(author__username=username)
+
+
+def freshness(request, posts, *args, **kwargs):
+    """(ETag, Last-Modified) ленты; считается один раз на запрос."""
+    state = request.__dict__.setdefault('_freshness', {})
+    if posts not in state:
+        latest = posts(request, *args, **kwargs).order_by().aggregate(
+            latest=Max('pub_date'))['latest']
+        # Полный путь: у каждой страницы ленты свой ETag
+        parts = (request.get_full_path(), str(feed_version()),
+                 latest.isoformat() if latest else '')
+        tag = hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+        modified = feed_modified()
+        if time.time() - modified < 1:
+            state[posts] = tag, None
+        else:
+            state[posts] = tag, datetime.fromtimestamp(modified, timezone.utc)
+    return state[posts]
+
+
+def conditional(posts):
+    """Декоратор: ETag и Last-Modified ленты, 304 без рендера."""
+    def etag(request, *args, **kwargs):
+        return freshness(request, posts, *args, **kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return freshness(request, posts, *args, **kwargs)[1]
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def conditional_page(posts):
+    """Декоратор HTML-ленты: 304 и публичный кэш для гостей.
+
+    Страница вошедшего пользователя зависит от него самого (меню,
+    подписки), поэтому она собирается всегда и помечается private.
+    """
+    def decorator(view_func):
+        conditional_view = conditional(posts)(view_func)
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                response = view_func(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, public=True,
+                                    max_age=settings.FEED_HTTP_MAX_AGE)
+            # Прокси не должен отдать гостевую страницу вошедшему
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapped
+    return decorator
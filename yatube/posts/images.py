@@ -0,0 +1,64 @@
+"""Размеры картинки поста и крошечная заглушка (LQIP).
+
+Считаются один раз при загрузке (обработчик pre_save в posts.signals)
+или командой backfill_image_meta, чтобы шаблоны ставили width/height
+и размытый фон, не открывая файл через Pillow. Там же картинки больше
+POST_IMAGE_MAX_SIDE уменьшаются перед сохранением.
+"""
+import base64
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .models import Post
+
+# Ширина заглушки в пикселях: в data URI это несколько сотен байт
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def downscale(file):
+    """Уменьшенная копия картинки больше POST_IMAGE_MAX_SIDE или None.
+
+    Анимацию уменьшение потеряло бы, поэтому такие файлы не трогаются.
+    """
+    limit = settings.POST_IMAGE_MAX_SIDE
+    with Image.open(file) as image:
+        if max(image.size) <= limit or getattr(image, 'is_animated', False):
+            return None
+        fmt = image.format
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        if fmt == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, fmt, quality=90)
+    return ContentFile(buffer.getvalue(), name=file.name)
+
+
+def describe(file):
+    """(ширина, высота, data URI заглушки) для открытого файла."""
+    with Image.open(file) as image:
+        width, height = image.size
+        image.draft('RGB', (PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+        preview = image.convert('RGB')
+    preview.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{encoded}'
+
+
+def describe_stored(name):
+    """describe() для файла из хранилища; None, если его не прочитать.
+
+    Выполняется в процессах пула backfill_image_meta, поэтому получает
+    и возвращает только простые значения.
+    """
+    try:
+        storage = Post._meta.get_field('image').storage
+        with storage.open(name) as file:
+            return describe(file)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,75 @@
+"""Пакетная загрузка связей на время одного запроса.
+
+Loader работает как DataLoader: сначала собирает id, которые нужны
+странице, потом читает каждую модель одним in_bulk. Прочитанное
+остаётся в карте идентичности запроса, поэтому автор, который
+встречается в ленте, раскрытии API и шапке страницы, читается один
+раз, а заранее известные объекты (группа на странице группы, автор в
+профиле) кладутся туда через prime и не читаются вовсе.
+"""
+from collections import defaultdict
+
+
+class Loader:
+    def __init__(self):
+        self._objects = defaultdict(dict)
+        self._pending = defaultdict(set)
+
+    def prime(self, *instances):
+        """Кладёт уже загруженные объекты в карту идентичности."""
+        for instance in instances:
+            self._objects[type(instance)].setdefault(instance.pk, instance)
+
+    def want(self, model, ids):
+        """Ставит id в очередь; читаются все сразу в resolve()."""
+        known = self._objects[model]
+        self._pending[model].update(
+            pk for pk in ids if pk is not None and pk not in known)
+
+    def resolve(self):
+        """Один in_bulk на каждую модель с недостающими id."""
+        pending, self._pending = self._pending, defaultdict(set)
+        for model, ids in pending.items():
+            if ids:
+                self._objects[model].update(
+                    model._default_manager.in_bulk(ids))
+
+    def get(self, model, pk):
+        return self._objects[model].get(pk)
+
+    def attach(self, instances, *field_names):
+        """Заполняет внешние ключи field_names у instances.
+
+        Связи, уже прочитанные select_related, не перечитываются, а
+        попадают в карту идентичности: одинаковые объекты разных строк
+        заменяются одним. Возвращает instances списком.
+        """
+        instances = list(instances)
+        if not instances:
+            return instances
+        fields = [instances[0]._meta.get_field(name) for name in field_names]
+        for field in fields:
+            model = field.related_model
+            for instance in instances:
+                if field.is_cached(instance):
+                    related = field.get_cached_value(instance)
+                    if related is not None:
+                        self.prime(related)
+                        field.set_cached_value(
+                            instance, self.get(model, related.pk))
+                else:
+                    self.want(model, (getattr(instance, field.attname),))
+        self.resolve()
+        for field in fields:
+            for instance in instances:
+                if not field.is_cached(instance):
+                    field.set_cached_value(instance, self.get(
+                        field.related_model,
+                        getattr(instance, field.attname)))
+        return instances
+
+
+def for_request(request):
+    """Loader запроса: один на запрос, общий для представления,
+    шаблонных тегов и API."""
+    return request.__dict__.setdefault('_loader', Loader())
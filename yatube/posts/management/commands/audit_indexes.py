@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import threads, timelines
+from posts.models import Comment, Post, path_segment
+from posts.paginators import CursorPaginator
+from posts.views import COMMENT_ORDERING
+
+User = get_user_model()
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют представления.
+
+    Значения параметров условные: план SQLite от них не зависит.
+    """
+    page = settings.COUNT_IN_PAGES
+    feed = Post.objects.select_related('author', 'group')
+    paginator = CursorPaginator(feed, page)
+    cursor_filter = paginator._seek(['2000-01-01T00:00:00+00:00', 1])
+    reader = User(pk=1)
+    follow_paginator = CursorPaginator(
+        Post.objects.none(), page, timelines.FEED_ORDERING)
+    comments = Comment.objects.filter(post_id=1, depth=0).select_related(
+        'author').order_by(*COMMENT_ORDERING)
+    root = Comment(post_id=1, path=path_segment(1))
+    per_page = settings.COMMENTS_PER_PAGE
+    comment_paginator = CursorPaginator(comments, per_page, COMMENT_ORDERING)
+    comment_filter = comment_paginator._seek(
+        ['2000-01-01T00:00:00+00:00', 1])
+    return {
+        'index': feed[:page],
+        'index (cursor)': feed.filter(cursor_filter).order_by(
+            *paginator.ordering)[:page],
+        'group_posts': feed.filter(group_id=1)[:page],
+        'group_posts (cursor)': feed.filter(group_id=1).filter(
+            cursor_filter).order_by(*paginator.ordering)[:page],
+        'profile': feed.filter(author_id=1)[:page],
+        'profile (cursor)': feed.filter(author_id=1).filter(
+            cursor_filter).order_by(*paginator.ordering)[:page],
+        'follow_index': timelines.feed_for(reader).select_related(
+            'author', 'group')[:page],
+        'follow_index (cursor)': timelines.feed_for(reader).filter(
+            follow_paginator._seek(['2000-01-01T00:00:00+00:00', 1]))[:page],
+        # Авторы «на чтении»: куски ленты и постов авторов без общей
+        # сортировки, см. timelines.MergedFeed
+        'follow_index (pull authors)': timelines.merged_feed(
+            reader, [2, 3]).select_related('author', 'group').page(0, page),
+        'follow_index (pull authors, cursor)': timelines.merged_feed(
+            reader, [2, 3]).filter(follow_paginator._seek(
+                ['2000-01-01T00:00:00+00:00', 1])).page(0, page),
+        'post_detail comments': comments[:per_page],
+        'post_detail comments (cursor)': comments.filter(
+            comment_filter)[:per_page],
+        'comment_replies': Comment.objects.filter(
+            threads.subtree(root)).select_related('author').order_by(
+            *threads.REPLY_ORDERING)[:settings.COMMENT_REPLIES_PER_PAGE],
+    }
+
+
+def plan_problems(plan):
+    """Полные сканы таблиц и сортировки во временном B-дереве.
+
+    Скан подзапроса-сопрограммы и сортировка его строк проблемой не
+    считаются: в запросах лент такие подзапросы — куски с LIMIT
+    страницы (timelines.MergedFeed), и сортируется не больше них.
+    """
+    coroutines = {row[-1].split()[-1] for row in plan
+                  if row[-1].startswith('CO-ROUTINE')}
+    bounded = {row[1] for row in plan
+               if row[-1].startswith('SCAN')
+               and row[-1].split()[1] in coroutines}
+    problems = []
+    for row in plan:
+        detail = row[-1]
+        if row[1] in bounded and (detail.startswith('SCAN')
+                                  or 'TEMP B-TREE' in detail):
+            continue
+        if detail.startswith('SCAN') and 'USING' not in detail:
+            problems.append(detail)
+        if 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов лент и отмечает '
+            'полные сканы таблиц и сортировки во временном B-дереве')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true',
+                            help='Завершаться с ошибкой при находках')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только в SQLite')
+        flagged = 0
+        for name, queryset in feed_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = cursor.fetchall()
+            problems = plan_problems(plan)
+            style = self.style.WARNING if problems else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: '
+                                    f'{"проблемы" if problems else "ok"}'))
+            for row in plan:
+                self.stdout.write(f'    {row[-1]}')
+            flagged += bool(problems)
+        if flagged and options['fail']:
+            raise CommandError(f'Запросов с проблемным планом: {flagged}')
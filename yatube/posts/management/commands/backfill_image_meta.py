@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.images import describe_stored
+from posts.models import Post
+
+from .reconcile_counters import batches
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры и заглушки картинок постов, у которых их '
+            'ещё нет; файлы читаются в пуле процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Число процессов (по умолчанию по ядрам)')
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').filter(image_width=None)
+        filled = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for pks in batches(pending, options['batch_size']):
+                posts = list(Post.objects.filter(pk__in=pks)
+                             .only('pk', 'image'))
+                results = pool.map(describe_stored,
+                                   [post.image.name for post in posts])
+                changed = []
+                for post, meta in zip(posts, results):
+                    if meta is None:
+                        failed += 1
+                        continue
+                    (post.image_width, post.image_height,
+                     post.image_placeholder) = meta
+                    changed.append(post)
+                Post.objects.bulk_update(
+                    changed,
+                    ['image_width', 'image_height', 'image_placeholder'])
+                filled += len(changed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено картинок: {filled}, не удалось прочитать: {failed}'))
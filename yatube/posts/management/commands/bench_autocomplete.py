@@ -0,0 +1,70 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import autocomplete
+from posts.autocomplete import PrefixIndex
+
+
+def _percentile(timings, share):
+    return sorted(timings)[int(len(timings) * share) - 1] * 1000
+
+
+class Command(BaseCommand):
+    help = ('Меряет поиск по префиксу в PrefixIndex на синтетических '
+            'именах пользователей: построение, p50/p99 поиска и '
+            'добавления, а также suggest() целиком, вместе с чтением '
+            'версии из кэша; БД не используется')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        alphabet = string.ascii_lowercase + string.digits + '_'
+
+        def username():
+            return ''.join(rng.choices(alphabet, k=rng.randint(4, 16)))
+
+        started = time.perf_counter()
+        index = PrefixIndex(
+            (pk, username(), None) for pk in range(options['size']))
+        self.stdout.write(f'построение {len(index)}: '
+                          f'{time.perf_counter() - started:.2f} с')
+
+        timings = []
+        for _ in range(options['queries']):
+            prefix = username()[:rng.randint(1, 4)]
+            started = time.perf_counter()
+            index.search(prefix, 10)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f'поиск: p50 {_percentile(timings, 0.5):.3f} мс, '
+                          f'p99 {_percentile(timings, 0.99):.3f} мс')
+
+        # suggest() как в запросе: версия журнала читается из кэша
+        # CACHES['default'], индекс — уже построенный выше
+        autocomplete._state.update(
+            version=autocomplete._shared_version(),
+            indexes={'authors': index, 'groups': PrefixIndex(())})
+        timings = []
+        for _ in range(options['queries']):
+            prefix = username()[:rng.randint(1, 4)]
+            started = time.perf_counter()
+            autocomplete.suggest(prefix, 10)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f'suggest(): p50 {_percentile(timings, 0.5):.3f} мс, '
+            f'p99 {_percentile(timings, 0.99):.3f} мс')
+
+        timings = []
+        for pk in range(options['size'], options['size'] + 1000):
+            started = time.perf_counter()
+            index.add(pk, username(), None)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f'добавление: p50 {_percentile(timings, 0.5):.3f} мс, '
+            f'p99 {_percentile(timings, 0.99):.3f} мс')
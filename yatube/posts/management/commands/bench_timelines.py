@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from posts import timelines
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость записи и чтения ленты подписок '
+            'для fan-out on write и чтения постов автора на лету. '
+            'Все данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=2000,
+                            help='Число подписчиков у автора')
+        parser.add_argument('--posts', type=int, default=20,
+                            help='Сколько постов публикует автор')
+        parser.add_argument('--reads', type=int, default=50,
+                            help='Сколько раз читается первая страница')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            author, reader = self._create_audience(options['followers'])
+            # Порог выше числа подписчиков — fan-out on write,
+            # порог 0 — посты автора подмешиваются при чтении.
+            for mode, threshold in (('push', options['followers']),
+                                    ('pull', 0)):
+                with override_settings(TIMELINE_FANOUT_THRESHOLD=threshold):
+                    self._measure(mode, author, reader, options)
+            transaction.set_rollback(True)
+
+    def _create_audience(self, followers):
+        author = User.objects.create_user(username='bench_author')
+        User.objects.bulk_create([
+            User(username=f'bench_follower_{number}')
+            for number in range(followers)
+        ])
+        users = User.objects.filter(username__startswith='bench_follower_')
+        Follow.objects.bulk_create(
+            [Follow(user=user, author=author) for user in users])
+        return author, users.first()
+
+    def _measure(self, mode, author, reader, options):
+        entries_before = TimelineEntry.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for number in range(options['posts']):
+                Post.objects.create(author=author, text=f'bench {number}')
+            write_time = time.perf_counter() - started
+        entries = TimelineEntry.objects.count() - entries_before
+
+        started = time.perf_counter()
+        for _ in range(options['reads']):
+            list(timelines.feed_for(reader)[:settings.COUNT_IN_PAGES])
+        read_time = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{mode}: запись {write_time / options["posts"] * 1000:.2f} мс '
+            f'и {len(queries) / options["posts"]:.1f} запросов на пост, '
+            f'{entries} строк лент; '
+            f'чтение {read_time / options["reads"] * 1000:.2f} мс '
+            f'на страницу')
+        Post.objects.filter(author=author).delete()
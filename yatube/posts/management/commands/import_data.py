@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import threads
+from posts.cache import bump_feed_version
+from posts.models import Comment, Follow, ImportCheckpoint, Post
+
+# Модель, допустимые колонки и поле даты с auto_now_add
+KINDS = {
+    'posts': (Post, ('id', 'text', 'author_id', 'group_id', 'pub_date',
+                     'image'), 'pub_date'),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'parent_id',
+                           'text', 'created'), 'created'),
+    'follows': (Follow, ('id', 'user_id', 'author_id'), None),
+}
+
+
+def read_records(file, file_format):
+    """Записи входного файла по одной, как словари."""
+    if file_format == 'csv':
+        for row in csv.DictReader(file):
+            # Пустая ячейка CSV — это NULL
+            yield {key: value if value != '' else None
+                   for key, value in row.items()}
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def build_objects(records, model, columns, date_field, first=1):
+    now = timezone.now()
+    for number, record in enumerate(records, first):
+        unknown = set(record) - set(columns)
+        if unknown:
+            raise CommandError(
+                f'Запись {number}: неизвестные поля {sorted(unknown)}')
+        values = dict(record)
+        if date_field:
+            value = values.get(date_field)
+            if value is None:
+                value = now
+            elif isinstance(value, str):
+                value = parse_datetime(value)
+                if value is None:
+                    raise CommandError(
+                        f'Запись {number}: не разобрать {date_field}')
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, timezone.utc)
+            values[date_field] = value
+        yield model(**values)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def keep_dates(model, field_name):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из файла."""
+    if field_name is None:
+        yield
+        return
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из JSONL/CSV '
+            'пачками через bulk_create. Сигналы при загрузке не '
+            'срабатывают: счётчики, поисковый индекс, ленты и пути веток '
+            'комментариев пересчитываются в конце')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help='Файл .jsonl или .csv; - для stdin')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одном INSERT')
+        parser.add_argument('--transaction-size', type=int, default=20000,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--checkpoint',
+                            help='Имя отметки о загруженных записях в БД '
+                                 '(по умолчанию абсолютный путь к файлу)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Пропустить записи, загруженные раньше')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересчитывать производные данные; '
+                                 'удобно, если впереди ещё файлы')
+
+    def handle(self, *args, **options):
+        model, columns, date_field = KINDS[options['kind']]
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or (
+            None if path == '-' else os.path.abspath(path))
+        done = 0
+        if options['resume']:
+            if checkpoint is None:
+                raise CommandError('Для --resume со stdin нужен --checkpoint')
+            done = read_checkpoint(checkpoint)
+        file = (sys.stdin if path == '-'
+                else open(path, newline='', encoding='utf-8'))
+        try:
+            records = islice(read_records(file, file_format), done, None)
+            objects = build_objects(records, model, columns, date_field,
+                                    first=done + 1)
+            with keep_dates(model, date_field):
+                for chunk in chunks(objects, options['transaction_size']):
+                    with transaction.atomic():
+                        # Повтор подписки не должен обрывать загрузку
+                        model.objects.bulk_create(
+                            chunk, batch_size=options['batch_size'],
+                            ignore_conflicts=model is Follow)
+                        done += len(chunk)
+                        # Отметка фиксируется вместе с пачкой: после
+                        # сбоя --resume не загрузит её второй раз
+                        if checkpoint is not None:
+                            write_checkpoint(checkpoint, done)
+                    self.stdout.write(f'Загружено записей: {done}')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        if not options['skip_rebuild']:
+            self.rebuild(options['kind'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена, записей: {done}'))
+
+    def rebuild(self, kind):
+        """Пересчитывает то, что при обычном save() делают сигналы."""
+        if kind == 'comments':
+            filled = threads.fill_paths()
+            self.stdout.write(f'Путей веток заполнено: {filled}')
+        call_command('reconcile_counters', stdout=self.stdout)
+        if kind == 'posts':
+            call_command('rebuild_search_index', stdout=self.stdout)
+        if kind in ('posts', 'follows'):
+            call_command('rebuild_timelines', stdout=self.stdout)
+        bump_feed_version()
+
+
+def read_checkpoint(checkpoint):
+    done = (ImportCheckpoint.objects.filter(name=checkpoint)
+            .values_list('done', flat=True).first())
+    return done or 0
+
+
+def write_checkpoint(checkpoint, done):
+    ImportCheckpoint.objects.update_or_create(
+        name=checkpoint, defaults={'done': done})
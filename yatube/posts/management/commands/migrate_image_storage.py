@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import bump_feed_version
+from posts.models import Post
+
+from .reconcile_counters import batches
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов из плоского каталога posts/ в '
+            'адресуемое содержимым хранилище. Файл сначала связывается '
+            'жёсткой ссылкой с новым адресом, затем в БД меняется имя, '
+            'и только после этого удаляется старое имя. Миниатюры новых '
+            'имён готовятся заново при первом показе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        moved = missing = 0
+        for pks in batches(Post.objects.exclude(image=''),
+                           options['batch_size']):
+            posts = list(Post.objects.filter(pk__in=pks).only('pk', 'image'))
+            renames = {}
+            for name in {post.image.name for post in posts}:
+                if storage.is_addressed(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                renames[name] = storage.adopt(name)
+            changed = [post for post in posts if post.image.name in renames]
+            for post in changed:
+                post.image.name = renames[post.image.name]
+            with transaction.atomic():
+                Post.objects.bulk_update(changed, ['image'])
+            for old_name in renames:
+                if Post.objects.filter(image=old_name).exists():
+                    # На старое имя ещё ссылается пост из другой пачки
+                    continue
+                storage.delete(old_name)
+            moved += len(changed)
+        if moved:
+            bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, файлов не найдено: {missing}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+from .reconcile_counters import batches
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов заново'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        indexed = 0
+        # Одна транзакция: поиск не видит наполовину пустой индекс
+        with transaction.atomic():
+            backend.clear()
+            for pks in batches(Post.objects.all(), options['batch_size']):
+                backend.index(Post.objects.filter(pk__in=pks).only('text'))
+                indexed += len(pks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'))
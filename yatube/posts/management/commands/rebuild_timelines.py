@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timelines
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            timelines.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, записей: {TimelineEntry.objects.count()}'))
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts.models import Post
+
+User = get_user_model()
+
+
+def batches(queryset, size):
+    """Пачки первичных ключей по возрастанию, без OFFSET."""
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, комментариев и подписок '
+            'пачками и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        fixed_users = fixed_posts = 0
+        for pks in batches(User.objects.all(), size):
+            with transaction.atomic():
+                fixed_users += counters.reconcile_users(pks)
+        for pks in batches(Post.objects.all(), size):
+            with transaction.atomic():
+                fixed_posts += counters.reconcile_posts(pks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: пользователей {fixed_users}, '
+            f'постов {fixed_posts}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timelines
+
+
+class Command(BaseCommand):
+    help = ('Раскладывает по лентам подписчиков посты авторов, '
+            'опустившихся до TIMELINE_FANOUT_THRESHOLD; '
+            'запускается по расписанию')
+
+    def handle(self, *args, **options):
+        settled = timelines.settle()
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов разложено по лентам: {settled}'))
@@ -0,0 +1,80 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    # До этой миграции уникальность подписок не соблюдалась
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    duplicates = list(Follow.objects.order_by().values('user', 'author')
+                      .annotate(total=Count('id')).filter(total__gt=1))
+    if not duplicates:
+        return
+    keep = (Follow.objects.values('user', 'author')
+            .annotate(first_id=Min('id')).values_list('first_id', flat=True))
+    Follow.objects.exclude(id__in=list(keep)).delete()
+    # 0008 посчитала и дубли, а удаление исторических моделей сигналы
+    # счётчиков не вызывает: пересчитываем затронутых пользователей
+    for field, key in (('followers_count', 'author'),
+                       ('following_count', 'user')):
+        user_ids = {row[key] for row in duplicates}
+        totals = dict(Follow.objects.filter(**{f'{key}__in': user_ids})
+                      .order_by().values(key).annotate(total=Count('id'))
+                      .values_list(key, 'total'))
+        for user_id in user_ids:
+            UserCounter.objects.filter(user_id=user_id).update(
+                **{field: totals.get(user_id, 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_pub_date',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='text',
+            field=models.TextField(max_length=400),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Подписчики'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_post'),
+        ),
+        migrations.RunPython(drop_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique follow'),
+        ),
+    ]
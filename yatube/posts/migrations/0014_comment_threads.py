@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия posts.models.path_segment на момент миграции: формат пути
+# в уже созданных строках не должен зависеть от будущих правок модели
+PATH_SEGMENT = 7
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, len(DIGITS))
+        segment = DIGITS[digit] + segment
+    return segment.rjust(PATH_SEGMENT, '0')
+
+
+def fill_paths(apps, schema_editor):
+    # До этой миграции все комментарии были корнями
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.only('pk').iterator()
+    batch = []
+    for comment in comments:
+        comment.path = path_segment(comment.pk)
+        batch.append(comment)
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_created_id',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', '-created', '-id'], name='comment_post_root_created'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounter',
+            name='timeline_pull',
+            field=models.BooleanField(default=False, verbose_name='Лента на чтении'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_usercounter_timeline_pull'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Загружено записей')),
+            ],
+            options={
+                'verbose_name': 'Отметка загрузки',
+                'verbose_name_plural': 'Отметки загрузки',
+            },
+        ),
+    ]
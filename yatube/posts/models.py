@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -33,17 +36,58 @@ class Post(models.Model):
                               )
     image = models.ImageField('Картинка',
                               upload_to='posts/',
+                              storage=ContentAddressedStorage(),
                               blank=True)
+    # Заполняются при загрузке картинки (posts.images), чтобы шаблоны
+    # не открывали файл ради размеров
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField('Комментариев',
+                                                 default=0,
+                                                 editable=False)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            # -id замыкает индекс, чтобы курсорный порядок (pub_date, id)
+            # читался из индекса без досортировки
+            models.Index(fields=['-pub_date', '-id'], name='post_pub_date'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+# Ширина сегмента пути комментария: id в base36, хватает до 36**7
+PATH_SEGMENT = 7
+# Символ после всех цифр base36: path + PATH_END замыкает поддерево
+PATH_END = '~'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, len(DIGITS))
+        segment = DIGITS[digit] + segment
+    return segment.rjust(PATH_SEGMENT, '0')
+
+
+def thread_position(parent):
+    """(parent_id, путь родителя, depth) для ответа на parent."""
+    if parent.depth >= settings.COMMENT_MAX_DEPTH:
+        # Глубже не вкладываем: ответ встаёт рядом с родителем
+        return parent.parent_id, parent.path[:-PATH_SEGMENT], parent.depth
+    return parent.pk, parent.path, parent.depth + 1
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post,
                              blank=True,
@@ -63,15 +107,46 @@ class Comment(models.Model):
     created = models.DateTimeField('Дата комментария',
                                    auto_now_add=True
                                    )
+    parent = models.ForeignKey('self',
+                               blank=True,
+                               null=True,
+                               on_delete=models.CASCADE,
+                               related_name='replies',
+                               verbose_name='Ответ на',
+                               )
+    # Материализованный путь: сегменты id предков и самого комментария,
+    # см. posts.threads. Заполняются в save()
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            # Корни веток страницами по (created, id)
+            models.Index(fields=['post', 'depth', '-created', '-id'],
+                         name='comment_post_root_created'),
+            # Ветка целиком — один диапазон по path
+            models.Index(fields=['post', 'path'], name='comment_post_path'),
+        ]
 
     def __str__(self):
         return self.text[:30]
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        parent_path = ''
+        if self.parent is not None:
+            self.parent_id, parent_path, self.depth = thread_position(
+                self.parent)
+        # Сегмент пути — это id, который известен только после вставки
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = parent_path + path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -86,5 +161,87 @@ class Follow(models.Model):
                                )
 
     class Meta:
-        constraints = models.UniqueConstraint(
-            fields=['user', 'author'], name='unique follow')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique follow'),
+        ]
+
+
+class UserCounter(models.Model):
+    """Счётчики пользователя, поддерживаемые при записи (posts.counters)."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='counters',
+                                verbose_name='Пользователь',
+                                )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора читаются без раскладки по лентам, пока его не
+    # разложит posts.timelines.settle()
+    timeline_pull = models.BooleanField('Лента на чтении', default=False)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост).
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    подписок читается диапазоном по индексу (user, -pub_date, -post)
+    без join по Follow и без сортировки.
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Читатель',
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='Пост',
+                             )
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор поста',
+                               )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique timeline entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_post'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author'),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей файла уже загрузила команда import_data.
+
+    Отметка меняется в той же транзакции, что и пачка записей, поэтому
+    --resume после сбоя продолжает ровно с первой незафиксированной.
+    """
+    name = models.CharField('Файл', max_length=255, unique=True)
+    done = models.PositiveIntegerField('Загружено записей', default=0)
+
+    class Meta:
+        verbose_name = 'Отметка загрузки'
+        verbose_name_plural = 'Отметки загрузки'
+
+    def __str__(self):
+        return f'{self.name}: {self.done}'
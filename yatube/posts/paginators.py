@@ -0,0 +1,192 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import (FieldDoesNotExist, FieldError,
+                                    ValidationError)
+from django.db.models import Q
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page в той части,
+    которая нужна шаблонам, но вместо номеров страниц отдаёт
+    непрозрачные токены соседних страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается условием «строго после/до ключа» по полям
+    ordering, поэтому глубокие страницы стоят столько же, сколько
+    первая, а COUNT(*) не выполняется вовсе. Последнее поле ordering
+    должно быть уникальным (обычно pk), иначе ключ неоднозначен.
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def encode_cursor(self, item, direction):
+        values = [
+            _serialize(_field_value(item, field.lstrip('-')))
+            for field in self.ordering
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения) или None для битого токена."""
+        if not cursor:
+            return None
+        padded = cursor + '=' * (-len(cursor) % 4)
+        try:
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        if (direction not in (self.NEXT, self.PREVIOUS)
+                or not isinstance(values, list)
+                or len(values) != len(self.ordering)):
+            return None
+        try:
+            values = [self._clean(field.lstrip('-'), value)
+                      for field, value in zip(self.ordering, values)]
+        except (ValidationError, TypeError, ValueError):
+            # Токен разобрался, но значения не того типа: подделка
+            return None
+        return direction, values
+
+    def _clean(self, name, value):
+        """Значение ключа из токена, приведённое к типу поля."""
+        if (isinstance(value, bool)
+                or not isinstance(value, (str, int, float))):
+            raise TypeError(f'Недопустимое значение ключа: {value!r}')
+        field = self._key_field(name)
+        if field is None:
+            # Ключ, которого нет в запросе (ранг поиска): хватает
+            # проверки выше
+            return value
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError(f'Пустое значение ключа {name}')
+        return value
+
+    def _key_field(self, name):
+        """Поле модели или выходное поле аннотации для ключа name."""
+        opts = self.object_list.model._meta
+        try:
+            return opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            pass
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is None:
+            return None
+        try:
+            return annotation.output_field
+        except FieldError:
+            return None
+
+    def _seek(self, values, reverse=False):
+        """Условие «строго после ключа» в порядке ordering.
+
+        Для (a, b) по убыванию это a <= va AND (a < va OR (a = va AND
+        b < vb)): ведущее a <= va даёт диапазон по индексу, без него
+        SQLite разворачивает OR в MULTI-INDEX OR и сортирует заново.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') != reverse else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.object_list
+        if decoded is None:
+            items = list(
+                queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_next, has_previous = has_more, False
+        else:
+            direction, values = decoded
+            if direction == self.NEXT:
+                items = list(
+                    queryset.filter(self._seek(values))
+                    .order_by(*self.ordering)[:self.per_page + 1])
+                has_more = len(items) > self.per_page
+                items = items[:self.per_page]
+                has_next, has_previous = has_more, True
+            else:
+                reverse_ordering = [_reverse(field)
+                                    for field in self.ordering]
+                items = list(
+                    queryset.filter(self._seek(values, reverse=True))
+                    .order_by(*reverse_ordering)[:self.per_page + 1])
+                has_more = len(items) > self.per_page
+                items = items[:self.per_page][::-1]
+                has_next, has_previous = True, has_more
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = self.encode_cursor(items[-1], self.NEXT)
+        if items and has_previous:
+            previous_cursor = self.encode_cursor(items[0], self.PREVIOUS)
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+def _reverse(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _field_value(item, name):
+    if isinstance(item, dict):
+        return item['id'] if name == 'pk' and 'pk' not in item else item[name]
+    return getattr(item, name)
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
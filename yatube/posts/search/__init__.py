@@ -0,0 +1,61 @@
+"""Полнотекстовый поиск по постам.
+
+Движок выбирается настройкой POST_SEARCH_BACKEND (по умолчанию FTS5 в
+SQLite, posts.search.sqlite). Индекс обновляется обработчиками
+сигналов Post, а команда rebuild_search_index строит его заново.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from ..models import Post
+from ..paginators import CursorPage, CursorPaginator
+
+ORDERING = ('search_rank', 'pk')
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.POST_SEARCH_BACKEND)()
+
+
+def highlight(snippet):
+    """Фрагмент с совпадениями в <mark>, остальной текст экранирован."""
+    backend = get_backend()
+    html = escape(snippet)
+    html = html.replace(backend.HIGHLIGHT_START, '<mark>')
+    return mark_safe(html.replace(backend.HIGHLIGHT_END, '</mark>'))
+
+
+def search_page(query, per_page, cursor=None):
+    """Страница результатов: посты с search_rank и search_snippet.
+
+    Страницы идут только вперёд: ключ (ранг, id) последнего результата
+    передаётся движку, и он сам отбирает следующие.
+    """
+    paginator = CursorPaginator(Post.objects.none(), per_page, ORDERING)
+    decoded = paginator.decode_cursor(cursor)
+    after = None
+    if decoded is not None and decoded[0] == paginator.NEXT:
+        after = decoded[1]
+    hits = get_backend().search(query, per_page + 1, after=after)
+    has_next = len(hits) > per_page
+    hits = hits[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [hit['id'] for hit in hits])
+    results = []
+    for hit in hits:
+        post = posts.get(hit['id'])
+        if post is None:
+            # Индекс отстал от удаления: просто пропускаем
+            continue
+        post.search_rank = hit['search_rank']
+        post.search_snippet = highlight(hit['snippet'])
+        results.append(post)
+    next_cursor = None
+    if has_next:
+        next_cursor = paginator.encode_cursor(hits[-1], paginator.NEXT)
+    return CursorPage(results, paginator, next_cursor)
@@ -0,0 +1,24 @@
+class SearchBackend:
+    """Интерфейс поискового движка постов.
+
+    search() отдаёт словари {'id', 'search_rank', 'snippet'} в порядке
+    (search_rank, id) по возрастанию: меньший ранг — лучшее совпадение.
+    after — значения этого порядка у последнего показанного результата,
+    так что страницы выбираются по ключу, как в CursorPaginator.
+    snippet — фрагмент текста, где совпадения обрамлены HIGHLIGHT_START
+    и HIGHLIGHT_END; экранирование HTML остаётся вызывающему коду.
+    """
+    HIGHLIGHT_START = '\x02'
+    HIGHLIGHT_END = '\x03'
+
+    def index(self, posts):
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, after=None):
+        raise NotImplementedError
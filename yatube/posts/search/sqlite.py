@@ -0,0 +1,64 @@
+"""Поиск по виртуальной таблице FTS5 в той же базе SQLite.
+
+Таблица posts_post_fts (создаётся миграцией) хранит копию текста
+поста с rowid = id поста: обычная, а не external content таблица,
+чтобы обновление не требовало старого текста. Ранжирование — bm25,
+подсветка — snippet().
+"""
+import re
+
+from django.db import connection
+
+from .base import SearchBackend
+
+TABLE = 'posts_post_fts'
+# Слов во фрагменте вокруг совпадения
+SNIPPET_TOKENS = 24
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH: все слова, каждое в
+    кавычках, чтобы операторы FTS5 в тексте не разбирались."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+class FTS5Backend(SearchBackend):
+    def index(self, posts):
+        rows = [(post.pk, post.text) for post in posts]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                               [(pk,) for pk, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows)
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                               [(pk,) for pk in post_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def search(self, query, limit, after=None):
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f'SELECT rowid, rank, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s')
+        params = [self.HIGHLIGHT_START, self.HIGHLIGHT_END, '…',
+                  SNIPPET_TOKENS, expression]
+        if after is not None:
+            rank, pk = after
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [rank, rank, pk]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [{'id': pk, 'search_rank': rank, 'snippet': snippet}
+                    for pk, rank, snippet in cursor.fetchall()]
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, counters, images, search, timelines
+from .cache import bump_feed_version
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def measure_image(sender, instance, raw=False, **kwargs):
+    # Файл ещё не сохранён в storage только у новой загрузки: её
+    # слишком большую картинку уменьшаем и измеряем
+    image = instance.image
+    if raw or (image and image._committed):
+        return
+    if not image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+        return
+    try:
+        downscaled = images.downscale(image)
+    finally:
+        image.seek(0)
+    if downscaled is not None:
+        instance.image = downscaled
+        image = instance.image
+    try:
+        (instance.image_width, instance.image_height,
+         instance.image_placeholder) = images.describe(image)
+    finally:
+        image.seek(0)
+
+
+# Счётчики подключены первыми: раскладка лент читает followers_count
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment(instance.author_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'posts_count')
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.increment_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.increment_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'followers_count')
+    counters.decrement(instance.user_id, 'following_count')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timelines.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timelines.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
+
+# Журнал автодополнения пишется после фиксации: откаченное имя не
+# должно попасть в подсказки других процессов
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def index_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    kind = 'authors' if sender is User else 'groups'
+    # Вход пользователя, например, сохраняет только last_login
+    if raw or (update_fields and not (
+            autocomplete.INDEXED_FIELDS[kind] & set(update_fields))):
+        return
+    entry = autocomplete.entry(kind, instance)
+    transaction.on_commit(lambda: autocomplete.record(kind, entry[0], entry))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def unindex_name(sender, instance, **kwargs):
+    kind = 'authors' if sender is User else 'groups'
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.record(kind, pk))
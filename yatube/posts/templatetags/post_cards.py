@@ -0,0 +1,40 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import loaders, thumbnails
+from ..cache import post_card_key
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов страницы: один get_many, рендер только промахов."""
+    request = context.get('request')
+    loader = loaders.for_request(request) if request else loaders.Loader()
+    # Авторы и группы, не прочитанные вместе с постами, — по одному
+    # in_bulk на модель
+    posts = loader.attach(posts, 'author', 'group')
+    keys = {post_card_key(post): post for post in posts}
+    cached = cache.get_many(list(keys))
+    # Миниатюры всех некэшированных карточек одним обращением
+    thumbnails.prefetch([post.image for key, post in keys.items()
+                         if key not in cached],
+                        thumbnails.card_aliases())
+    rendered = {}
+    cards = []
+    for key, post in keys.items():
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string('posts/includes/post_card.html',
+                                    {'post': post})
+            # Карточку без готовых вариантов картинки не кэшируем
+            if not post.image or thumbnails.ready(post.image):
+                rendered[key] = card
+        cards.append(mark_safe(card))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
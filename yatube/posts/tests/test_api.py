@@ -0,0 +1,117 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..models import Comment, Follow, Group, Post
+from .test_views import cursor
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for number in range(5):
+            cls.post = Post.objects.create(author=cls.author,
+                                           group=cls.group,
+                                           text=f'Пост {number}')
+        cls.comment = Comment.objects.create(post=cls.post,
+                                             author=cls.reader,
+                                             text='Комментарий')
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Ответ', parent=cls.comment)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def get(self, name, *args, **params):
+        return self.guest_client.get(reverse(name, args=args), params)
+
+    def test_posts_walk_by_cursor(self):
+        first = self.get('posts:api_posts').json()
+        second = self.get('posts:api_posts',
+                          cursor=first['next_cursor']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            list(Post.objects.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True)))
+        self.assertIsNone(second['next_cursor'])
+
+    def test_tampered_cursor_returns_first_page(self):
+        data = self.get('posts:api_posts', cursor=cursor([{'a': 1}, 1]))
+        self.assertEqual(data.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [post['id'] for post in data.json()['results']],
+            list(Post.objects.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True)[:3]))
+
+    def test_sparse_fields(self):
+        data = self.get('posts:api_posts', fields='id,text').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+
+    def test_unknown_field_rejected(self):
+        response = self.get('posts:api_posts', fields='id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_expand_reads_each_relation_once(self):
+        url = reverse('posts:api_posts')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.guest_client.get(
+                url, {'expand': 'author,group'}).json()
+        # Страница, авторы и группы
+        self.assertEqual(len(queries), 3)
+        self.assertLessEqual(len(queries), resolve(url).func.query_budget)
+        post = data['results'][0]
+        self.assertEqual(post['author'], {
+            'id': self.author.pk, 'username': 'writer',
+            'full_name': 'Лев Толстой'})
+        self.assertEqual(post['group']['slug'], 'group')
+
+    def test_filter_posts_by_group(self):
+        other = Group.objects.create(title='Другая', slug='other',
+                                     description='Описание')
+        Post.objects.create(author=self.author, group=other, text='Чужой')
+        data = self.get('posts:api_posts', group='other').json()
+        self.assertEqual([post['text'] for post in data['results']],
+                         ['Чужой'])
+
+    def test_post_detail_and_missing_post(self):
+        data = self.get('posts:api_post', self.post.pk).json()
+        self.assertEqual(data['text'], 'Пост 4')
+        response = self.get('posts:api_post', 0)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_in_thread_order(self):
+        data = self.get('posts:api_post_comments', self.post.pk,
+                        fields='text,depth').json()
+        self.assertEqual(data['results'], [
+            {'text': 'Комментарий', 'depth': 0},
+            {'text': 'Ответ', 'depth': 1},
+        ])
+
+    def test_groups(self):
+        data = self.get('posts:api_groups').json()
+        self.assertEqual(data['results'][0]['slug'], 'group')
+        data = self.get('posts:api_group', 'group', fields='title').json()
+        self.assertEqual(data, {'title': 'Группа'})
+
+    def test_follows(self):
+        data = self.get('posts:api_follows', user='reader',
+                        expand='author').json()
+        self.assertEqual(data['results'][0]['author']['username'],
+                         'writer')
+        response = self.get('posts:api_follows')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import autocomplete
+from ..autocomplete import PrefixIndex
+from ..models import Group
+
+User = get_user_model()
+
+
+class PrefixIndexTest(SimpleTestCase):
+    def test_search_add_remove(self):
+        index = PrefixIndex([(1, 'Anna', 'Anna'), (2, 'anton', 'anton'),
+                             (3, 'boris', 'boris')])
+        self.assertEqual(index.search('AN', 10), ['Anna', 'anton'])
+        self.assertEqual(index.search('an', 1), ['Anna'])
+        index.add(2, 'bogdan', 'bogdan')
+        self.assertEqual(index.search('an', 10), ['Anna'])
+        self.assertEqual(index.search('bo', 10), ['bogdan', 'boris'])
+        index.remove(3)
+        self.assertEqual(index.search('b', 10), ['bogdan'])
+        self.assertEqual(len(index), 2)
+
+
+class AutocompleteApiTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete._state.update(version=None, indexes=None)
+        self.user = User.objects.create_user(username='leo')
+        Group.objects.create(title='Лев Толстой', slug='lev-tolstoy',
+                             description='Описание')
+
+    def suggest(self, prefix):
+        return self.client.get(reverse('posts:autocomplete'),
+                               {'q': prefix}).json()
+
+    def test_suggests_authors_and_groups(self):
+        data = self.suggest('LE')
+        self.assertEqual([item['username'] for item in data['authors']],
+                         ['leo'])
+        self.assertEqual(data['groups'][0]['url'],
+                         reverse('posts:group_list', args=('lev-tolstoy',)))
+
+    def test_changes_are_replayed(self):
+        self.suggest('le')
+        with self.assertNumQueries(0):
+            self.suggest('le')
+        self.user.username = 'lion'
+        self.user.save()
+        User.objects.create_user(username='lena')
+        Group.objects.get().delete()
+        with self.assertNumQueries(0):
+            data = self.suggest('l')
+        self.assertEqual([item['username'] for item in data['authors']],
+                         ['lena', 'lion'])
+        self.assertEqual(data['groups'], [])
+
+    def test_suggest_does_not_write_to_cache(self):
+        self.suggest('le')
+        with mock.patch.object(cache, 'add') as add, \
+                mock.patch.object(cache, 'set') as set_:
+            self.suggest('le')
+        add.assert_not_called()
+        set_.assert_not_called()
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(author=CountersTests.author, text='Пост')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'})
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': CountersTests.author.username}))
+        author_counter = UserCounter.objects.get(user=CountersTests.author)
+        self.assertEqual(author_counter.posts_count, 1)
+        self.assertEqual(author_counter.followers_count, 1)
+        self.assertEqual(
+            UserCounter.objects.get(user=CountersTests.user).following_count,
+            1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        Comment.objects.filter(post=post).delete()
+        Follow.objects.filter(user=CountersTests.user).delete()
+        post.refresh_from_db()
+        author_counter.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(author_counter.followers_count, 0)
+
+    def test_post_detail_reads_counter(self):
+        post = Post.objects.create(author=CountersTests.author, text='Пост')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.context['count_post'], 1)
+
+    def test_reconcile_repairs_drift(self):
+        post = Post.objects.create(author=CountersTests.author, text='Пост')
+        Comment.objects.create(
+            post=post, author=CountersTests.user, text='Комментарий')
+        UserCounter.objects.filter(user=CountersTests.author).update(
+            posts_count=42)
+        UserCounter.objects.filter(user=CountersTests.user).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            UserCounter.objects.get(user=CountersTests.author).posts_count, 1)
+        self.assertTrue(
+            UserCounter.objects.filter(user=CountersTests.user).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_reconcile_below_threshold_defers_fan_out(self):
+        Follow.objects.create(user=CountersTests.user,
+                              author=CountersTests.author)
+        UserCounter.objects.filter(user=CountersTests.author).update(
+            followers_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        counter = UserCounter.objects.get(user=CountersTests.author)
+        self.assertEqual(counter.followers_count, 1)
+        self.assertTrue(counter.timeline_pull)
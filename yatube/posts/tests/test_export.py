@@ -0,0 +1,74 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from zipfile import ZipFile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_BATCH_SIZE=2)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        for number in range(3):
+            post = Post.objects.create(
+                author=cls.user,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(f'same{number}.gif', SMALL_GIF,
+                                         'image/gif'),
+            )
+        Comment.objects.create(post=post, author=cls.user, text='Отзыв')
+        cls.other = User.objects.create_user(username='other')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_archive_streams_posts_comments_and_images(self):
+        response = self.client.get(reverse(
+            'posts:profile_export', kwargs={'username': 'exporter'}))
+        self.assertTrue(response.streaming)
+        archive = ZipFile(BytesIO(b''.join(response.streaming_content)))
+        names = archive.namelist()
+        posts = [json.loads(line) for line in
+                 archive.read('posts.jsonl').decode().splitlines()]
+        self.assertEqual([post['text'] for post in posts],
+                         ['Пост 0', 'Пост 1', 'Пост 2'])
+        self.assertEqual(
+            json.loads(archive.read('comments.jsonl'))['text'], 'Отзыв')
+        # Одинаковые загрузки — один файл в storage и в архиве
+        images = [name for name in names if name.startswith('images/')]
+        self.assertEqual(images, [posts[0]['image']])
+        self.assertEqual(archive.read(images[0]), SMALL_GIF)
+
+    def test_only_own_archive(self):
+        response = self.client.get(reverse(
+            'posts:profile_export', kwargs={'username': 'other'}))
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': 'other'}))
@@ -0,0 +1,177 @@
+import time
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..cache import FEED_MODIFIED_KEY
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+def written_ago(seconds):
+    """Сдвигает время последней записи в ленты в прошлое."""
+    cache.set(FEED_MODIFIED_KEY, time.time() - seconds, None)
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Запись для читалок')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=(self.group.slug,)),
+            reverse('posts:group_atom', args=(self.group.slug,)),
+            reverse('posts:profile_rss', args=(self.author.username,)),
+            reverse('posts:profile_atom', args=(self.author.username,)),
+        )
+
+    def test_feeds_list_posts_with_validators(self):
+        written_ago(60)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Запись для читалок')
+                self.assertIn('xml', response['Content-Type'])
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+
+    def test_unchanged_feed_answers_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                # Только MAX(pub_date): ни объекта ленты, ни записей
+                self.assertEqual(len(queries), 1)
+
+    def test_new_post_changes_etag(self):
+        url = reverse('posts:group_rss', args=(self.group.slug,))
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Свежая запись')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Свежая запись')
+
+    def test_if_modified_since_alone(self):
+        url = reverse('posts:index_rss')
+        written_ago(60)
+        modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        # Правка и удаление самой новой записи дату не сдвигают вперёд
+        self.post.text = 'Исправленная запись'
+        self.post.save()
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertContains(response, 'Исправленная запись')
+        written_ago(60)
+        modified = self.guest_client.get(url)['Last-Modified']
+        self.post.delete()
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, 'Исправленная запись')
+
+    def test_no_last_modified_in_second_of_write(self):
+        # Дата HTTP с точностью до секунды: по ней не отличить ответ
+        # до записи от ответа после неё
+        response = self.guest_client.get(reverse('posts:index_rss'))
+        self.assertNotIn('Last-Modified', response)
+
+    def test_unknown_group_feed(self):
+        response = self.guest_client.get(
+            reverse('posts:group_rss', args=('missing',)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_feeds_fit_query_budget(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(url)
+                self.assertLessEqual(len(queries),
+                                     resolve(url).func.query_budget)
+
+
+class ConditionalPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Запись')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+
+    def test_guest_pages_are_public_and_revalidated(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_guest_pages_revalidated_by_date_alone(self):
+        written_ago(60)
+        for url in self.urls:
+            with self.subTest(url=url):
+                modified = self.guest_client.get(url)['Last-Modified']
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+        post = Post.objects.get()
+        post.text = 'Исправленная запись'
+        post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified)
+                self.assertContains(response, 'Исправленная запись')
+
+    def test_pages_of_feed_have_own_etags(self):
+        url = reverse('posts:index')
+        first = self.guest_client.get(url)['ETag']
+        second = self.guest_client.get(url, {'page': 2})['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_authorized_page_is_private_and_always_rendered(self):
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,250 @@
+import shutil
+import struct
+import tempfile
+import zlib
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище ключей sorl кэширует записи в общем кэше
+        cache.clear()
+
+    def render(self):
+        # Свежий экземпляр: результат prefetch хранится на картинке
+        post = Post.objects.get(pk=self.post.pk)
+        return Template(
+            '{% load post_images %}{% post_picture post %}'
+        ).render(Context({'post': post}))
+
+    def test_falls_back_to_original_and_queues(self):
+        """Пока миниатюры нет, тег отдаёт оригинал и ставит её в очередь."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.assertIn(f'src="{self.post.image.url}"', self.render())
+        schedule.assert_called_once_with(self.post.image.name)
+
+    def test_serves_generated_thumbnail(self):
+        thumbnails.generate(self.post.image.name)
+        expected = thumbnails.cached_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(expected)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.assertIn(f'src="{expected.url}"', self.render())
+        schedule.assert_not_called()
+
+    def test_picture_reads_store_once(self):
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        with self.assertNumQueries(2):
+            # Сам пост и все варианты его картинки
+            self.render()
+
+    def test_post_detail_with_image_fits_query_budget(self):
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, '<picture>')
+        self.assertLessEqual(len(queries), resolve(url).func.query_budget)
+
+    def test_failed_image_is_not_requeued(self):
+        name = self.post.image.name
+        pending = thumbnails.PENDING_KEY.format(name)
+        # Соединение закрывает поток пула, а не тест
+        with mock.patch.object(thumbnails, 'connection'), \
+                mock.patch.object(thumbnails, 'logger'):
+            cache.add(pending, True)
+            with mock.patch.object(thumbnails, 'get_thumbnail',
+                                   side_effect=OSError('битый файл')):
+                thumbnails._work(name)
+            self.assertTrue(cache.get(pending))
+            with mock.patch.object(thumbnails.transaction,
+                                   'on_commit') as on_commit:
+                thumbnails.schedule(name)
+            on_commit.assert_not_called()
+            thumbnails._work(name)
+        self.assertIsNone(cache.get(pending))
+
+    def test_prefetch_reads_store_once(self):
+        """Записи о миниатюрах страницы читаются одним запросом к БД."""
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        posts = [Post.objects.create(author=self.user, text=f'Пост {n}',
+                                     image=f'posts/missing{n}.gif')
+                 for n in range(5)]
+        posts.append(Post.objects.get(pk=self.post.pk))
+        images = [post.image for post in posts]
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(images, ['card'])
+        with self.assertNumQueries(0):
+            found = [thumbnails.cached_thumbnail(image, 'card')
+                     for image in images]
+        self.assertEqual(found[:5], [None] * 5)
+        self.assertIsNotNone(found[5])
+        # Отсутствие миниатюр тоже закэшировано
+        images = [Post.objects.get(pk=post.pk).image for post in posts[:5]]
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(images, ['card'])
+
+    def test_picture_lists_generated_variants(self):
+        thumbnails.generate(self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        html = Template(
+            '{% load post_images %}{% post_picture post %}'
+        ).render(Context({'post': post}))
+        # sorl-thumbnail не знает расширения AVIF
+        self.assertNotIn('AVIF', thumbnails.supported_formats())
+        for alias, (fmt, width) in thumbnails.variants().items():
+            url = thumbnails.cached_thumbnail(post.image, alias).url
+            self.assertIn(f'{url} {width}w', html)
+        self.assertIn(f'sizes="{settings.POST_IMAGE_SIZES}"', html)
+        self.assertIn(
+            thumbnails.cached_thumbnail(post.image, 'card').url, html)
+
+    def test_upload_records_dimensions(self):
+        self.assertEqual((self.post.image_width, self.post.image_height),
+                         (2, 1))
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,'))
+
+    def test_backfill_image_meta(self):
+        Post.objects.filter(pk=self.post.pk).update(
+            image_width=None, image_height=None, image_placeholder='')
+        missing = Post.objects.create(author=self.user, text='Без файла',
+                                      image='posts/missing.gif')
+        out = StringIO()
+        call_command('backfill_image_meta', '--workers=1', stdout=out)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder)
+        self.assertIsNone(Post.objects.get(pk=missing.pk).image_width)
+        self.assertIn('не удалось прочитать: 1', out.getvalue())
+
+    def test_migrate_image_storage(self):
+        storage = Post._meta.get_field('image').storage
+        FileSystemStorage().save('posts/legacy.gif', ContentFile(SMALL_GIF))
+        first, second = [
+            Post.objects.create(author=self.user, text=f'Старый {number}',
+                                image='posts/legacy.gif')
+            for number in range(2)]
+        call_command('migrate_image_storage', stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(storage.is_addressed(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        # Та же картинка, что у загруженного поста: файл общий
+        self.assertEqual(first.image.name, self.post.image.name)
+        self.assertFalse(storage.exists('posts/legacy.gif'))
+
+    @override_settings(DEBUG=True)
+    def test_feed_reports_thumbnail_lookups(self):
+        for number in range(5):
+            Post.objects.create(author=self.user, text=f'Пост {number}',
+                                image=f'posts/missing{number}.gif')
+        # Адрес вне INTERNAL_IPS, чтобы не включалась debug-панель
+        response = self.client.get(reverse('posts:index'),
+                                   REMOTE_ADDR='10.0.0.1')
+        # get_many из кэша и один запрос к БД на все шесть картинок
+        self.assertEqual(response['X-Thumbnail-Lookups'], '2')
+
+
+def _png_header(width, height):
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                         8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b'\x00' * 64)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+        })
+
+    @override_settings(POST_IMAGE_MAX_BYTES=10)
+    def test_oversized_file_rejected(self):
+        response = self.upload('big.gif', SMALL_GIF)
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+
+    def test_decompression_bomb_rejected(self):
+        response = self.upload('bomb.png', _png_header(100000, 100000))
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(response.context['form'].errors['image'],
+                         ['Слишком большое разрешение картинки.'])
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1)
+    def test_large_image_downscaled(self):
+        self.upload('wide.gif', SMALL_GIF)
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (1, 1))
+        with post.image.open() as file:
+            self.assertEqual(Image.open(file).size, (1, 1))
+
+    def test_csrf_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Без токена'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
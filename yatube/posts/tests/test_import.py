@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import threads
+from ..models import PATH_SEGMENT, Comment, Follow, ImportCheckpoint, Post
+
+User = get_user_model()
+
+
+class ImportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, *args, **options):
+        call_command('import_data', *args, stdout=StringIO(), **options)
+
+    def test_import_posts_keeps_dates_and_recounts(self):
+        path = self.write('posts.jsonl', '\n'.join(json.dumps({
+            'id': 100 + number,
+            'text': f'Импорт {number}',
+            'author_id': self.author.pk,
+            'pub_date': f'2020-01-0{number + 1}T10:00:00',
+        }) for number in range(3)))
+        self.load('posts', path, batch_size=2, transaction_size=2)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(self.author.counters.posts_count, 3)
+
+    def test_import_comments_fills_thread_paths(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.write('comments.csv', (
+            'id,post_id,author_id,parent_id,text,created\n'
+            f'500,{post.pk},{self.reader.pk},,Корень,\n'
+            f'501,{post.pk},{self.reader.pk},500,Ответ,\n'
+            f'502,{post.pk},{self.reader.pk},501,Ответ на ответ,\n'))
+        self.load('comments', path)
+        nested = Comment.objects.get(pk=502)
+        self.assertEqual(nested.depth, 2)
+        self.assertTrue(nested.path.startswith(
+            Comment.objects.get(pk=500).path))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 3)
+
+    def test_resume_skips_loaded_records(self):
+        path = self.write('follows.jsonl', '\n'.join(json.dumps({
+            'user_id': self.reader.pk, 'author_id': author.pk,
+        }) for author in (self.author, self.reader)))
+        ImportCheckpoint.objects.create(name=path, done=1)
+        self.load('follows', path, resume=True)
+        self.assertEqual(
+            list(Follow.objects.values_list('author_id', flat=True)),
+            [self.reader.pk])
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).done, 2)
+
+    def test_failed_chunk_keeps_checkpoint(self):
+        path = self.write('posts.jsonl', '\n'.join(json.dumps({
+            'text': f'Импорт {number}', 'author_id': self.author.pk,
+        }) for number in range(4)))
+        real_bulk_create = Post.objects.bulk_create
+        calls = []
+
+        def bulk_create(objects, **kwargs):
+            calls.append(objects)
+            created = real_bulk_create(objects, **kwargs)
+            if len(calls) == 2:
+                raise RuntimeError('сбой посреди загрузки')
+            return created
+
+        with mock.patch.object(Post.objects, 'bulk_create', bulk_create):
+            with self.assertRaises(RuntimeError):
+                self.load('posts', path, transaction_size=2,
+                          skip_rebuild=True)
+        # Вторая пачка откатилась вместе с отметкой
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).done, 2)
+        self.load('posts', path, resume=True, skip_rebuild=True)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Импорт {number}' for number in range(4)])
+
+    def test_fill_paths_pages_by_key(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        # Ответ 700 старше своего родителя 701: нужен второй проход
+        Comment.objects.bulk_create([
+            Comment(id=701, post=post, author=self.reader, text='Корень'),
+            Comment(id=700, post=post, author=self.reader, text='Ответ',
+                    parent_id=701),
+            *(Comment(id=710 + number, post=post, author=self.reader,
+                      text='Ответ', parent_id=701) for number in range(5)),
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(threads.fill_paths(batch_size=2), 7)
+        selects = [query['sql'] for query in queries
+                   if query['sql'].startswith('SELECT')]
+        # Каждый запрос продолжает с последнего id, а не с начала
+        self.assertTrue(all('"posts_comment"."id" >' in sql
+                            for sql in selects))
+        self.assertTrue(Comment.objects.get(pk=700).path.startswith(
+            Comment.objects.get(pk=701).path))
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_imported_replies_respect_max_depth(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.write('comments.jsonl', '\n'.join(json.dumps({
+            'id': 600 + number, 'post_id': post.pk,
+            'author_id': self.reader.pk, 'text': f'Уровень {number}',
+            'parent_id': 600 + number - 1 if number else None,
+        }) for number in range(4)))
+        self.load('comments', path)
+        root = Comment.objects.get(pk=600)
+        for pk in (602, 603):
+            comment = Comment.objects.get(pk=pk)
+            self.assertEqual(comment.depth, 1)
+            self.assertEqual(comment.parent_id, root.pk)
+            self.assertEqual(len(comment.path), 2 * PATH_SEGMENT)
+            self.assertTrue(comment.path.startswith(root.path))
+
+    def test_unknown_column_rejected(self):
+        path = self.write('posts.jsonl', json.dumps({'title': 'Нет'}))
+        with self.assertRaises(CommandError):
+            self.load('posts', path)
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..loaders import Loader
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class LoaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(2)]
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for number in range(6):
+            Post.objects.create(author=cls.authors[number % 2],
+                                group=cls.group, text=f'Пост {number}')
+        Follow.objects.create(user=cls.authors[0], author=cls.authors[1])
+
+    def test_attach_reads_each_model_once(self):
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(2):
+            Loader().attach(posts, 'author', 'group')
+            authors = {post.author.username for post in posts}
+            groups = {post.group.slug for post in posts}
+        self.assertEqual(authors, {'author0', 'author1'})
+        self.assertEqual(groups, {'group'})
+
+    def test_identity_map_shares_objects(self):
+        loader = Loader()
+        posts = loader.attach(Post.objects.all(), 'author')
+        comment = Comment(post=posts[0], author_id=self.authors[0].pk)
+        with self.assertNumQueries(0):
+            loader.attach([comment], 'author')
+        same_author = [post for post in posts
+                       if post.author_id == self.authors[0].pk]
+        self.assertIs(comment.author, same_author[0].author)
+
+    def test_selected_relations_are_primed_not_reread(self):
+        loader = Loader()
+        posts = list(Post.objects.select_related('author'))
+        with self.assertNumQueries(1):
+            loader.attach(posts, 'author', 'group')
+        self.assertIs(loader.get(User, posts[0].author_id), posts[0].author)
+
+    def test_feed_cards_without_join(self):
+        cache.clear()
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = Client().get(url)
+        self.assertContains(response, 'Пост 5')
+
+    def test_api_expands_users_of_follows_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = Client().get(reverse('posts:api_follows'), {
+                'user': 'author0', 'expand': 'user,author'}).json()
+        # Страница подписок и одно чтение пользователей
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(data['results'][0]['author']['username'],
+                         'author1')
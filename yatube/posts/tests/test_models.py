@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -57,3 +61,13 @@ class PostModelTest(TestCase):
                     post._meta.get_field(field).help_text,
                     help_text
                 )
+
+    def test_follow_is_unique(self):
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=PostModelTest.user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=PostModelTest.user, author=author)
+
+    def test_feed_queries_use_indexes(self):
+        # --fail падает при полном скане или сортировке во временном B-дереве
+        call_command('audit_indexes', fail=True, stdout=StringIO())
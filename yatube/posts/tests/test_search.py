@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Ежик <b>в тумане</b> искал лошадку')
+        Post.objects.create(author=cls.user, text='Совсем другой текст')
+
+    def setUp(self):
+        self.client = Client()
+
+    def results(self, query):
+        return list(search.search_page(query, 10))
+
+    def test_finds_and_highlights(self):
+        # Совпадение по целым словам, без учёта регистра
+        response = self.client.get(reverse('posts:search'), {'q': 'туман'})
+        page = response.context['page_obj']
+        self.assertEqual([post.pk for post in page], [])
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'ТУМАНЕ ежик'})
+        page = response.context['page_obj']
+        self.assertEqual([post.pk for post in page], [SearchTest.post.pk])
+        snippet = page[0].search_snippet
+        self.assertIn('<mark>ТУМАНЕ</mark>'.lower(), snippet.lower())
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(author=self.user, text='первая версия')
+        self.assertEqual(self.results('первая'), [post])
+        post.text = 'вторая версия'
+        post.save()
+        self.assertEqual(self.results('первая'), [])
+        self.assertEqual(self.results('вторая'), [post])
+        post.delete()
+        self.assertEqual(self.results('вторая'), [])
+
+    def test_ranking_and_cursor_pages(self):
+        posts = [Post.objects.create(
+            author=self.user, text='кот ' * (number + 1) + 'конец')
+            for number in range(settings.COUNT_IN_PAGES + 3)]
+        first = search.search_page('кот', settings.COUNT_IN_PAGES)
+        second = search.search_page('кот', settings.COUNT_IN_PAGES,
+                                    first.next_cursor)
+        found = list(first) + list(second)
+        self.assertEqual(sorted(post.pk for post in found),
+                         [post.pk for post in posts])
+        ranks = [post.search_rank for post in found]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertIsNone(second.next_cursor)
+
+    def test_api(self):
+        response = self.client.get(reverse('posts:search_api'),
+                                   {'q': 'лошадку'})
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [SearchTest.post.pk])
+        self.assertIn('<mark>лошадку</mark>', data['results'][0]['snippet'])
+        self.assertIsNone(data['next_cursor'])
+        response = self.client.get(reverse('posts:search_api'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_operators_in_query_are_plain_words(self):
+        self.assertEqual(self.results('"ежик" OR NEAR('),
+                         [])
+        self.assertEqual(self.results('ежик*'), [SearchTest.post])
+
+    def test_rebuild_command(self):
+        search.get_backend().clear()
+        self.assertEqual(self.results('ежик'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.results('ежик'), [SearchTest.post])
+
+    @override_settings(DEBUG=False)
+    def test_query_budget(self):
+        with self.assertNumQueries(settings.QUERY_BUDGETS['search'] - 2):
+            self.client.get(reverse('posts:search'), {'q': 'ежик'})
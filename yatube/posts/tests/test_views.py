@@ -1,14 +1,31 @@
+import base64
+import json
+from io import StringIO
+
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
-from django.urls import reverse
-
-from ..models import Group, Post, Follow
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from .. import timelines
+from ..cache import post_card_key
+from ..models import (Comment, Group, Post, Follow, TimelineEntry,
+                      UserCounter)
 
 User = get_user_model()
 
 
+def cursor(values, direction='n'):
+    """Токен курсора с произвольными значениями ключа."""
+    raw = json.dumps([direction, values]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -163,17 +180,66 @@ class PostViewsTests(TestCase):
         self.assertIsNotNone(post_in_detail_page)
 
     def test_cache_context(self):
-        response_before_create_post = self.authorized_client.get(
-            reverse('posts:index'))
-        first_item_before = response_before_create_post.content
+        cache.clear()
+        response_before = self.authorized_client.get(reverse('posts:index'))
+        # Запись в обход сигналов не сбрасывает версию: страница из кэша
+        Post.objects.filter(pk=PostViewsTests.post.pk).update(
+            text='Текст, изменённый в обход сигналов')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_cached.content, response_before.content)
+
+    def test_cache_invalidated_by_new_post(self):
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
         Post.objects.create(
             author=PostViewsTests.user,
             text='Тестовый текст для проверки кэша',
             group=PostViewsTests.group)
-        response_after_create_post = self.authorized_client.get(
-            reverse('posts:index'))
-        first_item_after = response_after_create_post.content
-        self.assertEqual(first_item_after, first_item_before)
+        response_after = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_after,
+                            'Тестовый текст для проверки кэша')
+
+    def test_cache_varies_by_page(self):
+        cache.clear()
+        Post.objects.bulk_create([
+            Post(author=PostViewsTests.user, text=f'Пост {number}')
+            for number in range(settings.COUNT_IN_PAGES)
+        ])
+        first_page = self.guest_client.get(reverse('posts:index'))
+        second_page = self.guest_client.get(
+            reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first_page.content, second_page.content)
+
+    def test_cache_ignores_unrelated_params(self):
+        cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        # Метки рекламных кампаний не плодят копий страницы в кэше
+        Post.objects.filter(pk=PostViewsTests.post.pk).update(
+            text='Текст, изменённый в обход сигналов')
+        response = self.guest_client.get(
+            reverse('posts:index') + '?utm_source=mail')
+        self.assertNotContains(response, 'Текст, изменённый в обход')
+
+    def test_post_edit_replaces_only_its_card(self):
+        cache.clear()
+        other_post = Post.objects.create(
+            author=PostViewsTests.user, text='Другой пост')
+        self.guest_client.get(reverse('posts:index'))
+        old_key = post_card_key(PostViewsTests.post)
+        other_key = post_card_key(other_post)
+        other_card = cache.get(other_key)
+        self.assertIsNotNone(cache.get(old_key))
+        self.assertIsNotNone(other_card)
+        self.authorized_client.post(
+            reverse('posts:post_edit',
+                    kwargs={'post_id': PostViewsTests.post.pk}),
+            data={'text': 'Изменённый текст'})
+        edited_post = Post.objects.get(pk=PostViewsTests.post.pk)
+        self.assertNotEqual(post_card_key(edited_post), old_key)
+        self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(cache.get(other_key), other_card)
+        self.assertIn('Изменённый текст',
+                      cache.get(post_card_key(edited_post)))
 
 
 class PaginatorViewsTest(TestCase):
@@ -248,6 +314,225 @@ class PaginatorViewsTest(TestCase):
                          PaginatorViewsTest.second_page_post)
 
 
+@override_settings(PAGINATION_MODES={'index': 'cursor'})
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([Post(
+            author=cls.user,
+            text=f'Тест текст {post}') for post in range(1, 14)
+        ])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        first_page = self.guest_client.get(
+            reverse('posts:index')).context['page_obj']
+        self.assertEqual(len(first_page), settings.COUNT_IN_PAGES)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.guest_client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        back_page = self.guest_client.get(
+            reverse('posts:index'),
+            {'cursor': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            list(Post.objects.order_by('-pub_date', '-pk')))
+
+    def test_cursor_page_does_not_count(self):
+        first_page = self.guest_client.get(
+            reverse('posts:index')).context['page_obj']
+        with self.assertNumQueries(1):
+            first_page.paginator.get_page(first_page.next_cursor)
+
+    @override_settings(PAGINATION_MODES={'follow_index': 'cursor'})
+    def test_cursor_pages_of_follow_feed(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        first_page = client.get(
+            reverse('posts:follow_index')).context['page_obj']
+        second_page = client.get(
+            reverse('posts:follow_index'),
+            {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in list(first_page) + list(second_page)],
+            list(Post.objects.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True)))
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.COUNT_IN_PAGES)
+
+    @override_settings(PAGINATION_MODES={'index': 'cursor',
+                                         'follow_index': 'cursor'})
+    def test_cursor_with_wrong_types_returns_first_page(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        for name in ('posts:index', 'posts:follow_index'):
+            for values in (['garbage', 1], [None, None], [{'a': 1}, 1],
+                           ['2020-01-01T00:00:00+00:00', 'x']):
+                with self.subTest(name=name, values=values):
+                    response = client.get(reverse(name),
+                                          {'cursor': cursor(values)})
+                    self.assertEqual(response.status_code, 200)
+                    page = response.context['page_obj']
+                    self.assertFalse(page.has_previous())
+                    self.assertEqual(len(page), settings.COUNT_IN_PAGES)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тест текст')
+        for number in range(7):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_batch(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-more=')
+
+    def test_load_more_returns_rest_as_fragment(self):
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(response, 'data-more=')
+        self.assertEqual(
+            list(first) + list(rest),
+            list(Comment.objects.order_by('-created', '-pk')))
+
+    def test_tampered_cursors_show_first_batch(self):
+        for name, parameter in (('posts:post_detail', 'comments'),
+                                ('posts:post_comments', 'cursor')):
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    reverse(name, kwargs={'post_id': self.post.pk}),
+                    {parameter: cursor([{'a': 1}, None])})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['comments']), 5)
+
+    def test_fragment_of_missing_post(self):
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(COMMENT_REPLIES_PER_PAGE=2, COMMENT_MAX_DEPTH=2)
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тест текст')
+        cls.root = Comment.objects.create(post=cls.post, author=cls.user,
+                                          text='Корень')
+        cls.reply = Comment.objects.create(post=cls.post, author=cls.user,
+                                           text='Ответ', parent=cls.root)
+        cls.nested = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Ответ на ответ',
+            parent=cls.reply)
+        cls.sibling = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Второй ответ',
+            parent=cls.root)
+        cls.other_root = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Другой корень')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_path_orders_thread_depth_first(self):
+        thread = Comment.objects.filter(
+            path__startswith=self.root.path).order_by('path')
+        self.assertEqual(
+            list(thread),
+            [self.root, self.reply, self.nested, self.sibling])
+        self.assertEqual(self.nested.depth, 2)
+
+    def test_reply_below_max_depth_becomes_sibling(self):
+        deep = Comment.objects.create(post=self.post, author=self.user,
+                                      text='Глубже', parent=self.nested)
+        self.assertEqual(deep.depth, 2)
+        self.assertEqual(deep.parent_id, self.reply.pk)
+        self.assertTrue(deep.path.startswith(self.reply.path))
+
+    def test_post_detail_shows_first_replies_of_each_thread(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        roots = {root.pk: root for root in response.context['comments']}
+        self.assertEqual(set(roots), {self.root.pk, self.other_root.pk})
+        replies = roots[self.root.pk].replies_page
+        self.assertEqual(list(replies), [self.reply, self.nested])
+        self.assertTrue(replies.has_next())
+        self.assertFalse(roots[self.other_root.pk].replies_page.has_next())
+
+    def test_load_more_replies_of_thread(self):
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        replies = next(root for root in first
+                       if root.pk == self.root.pk).replies_page
+        response = self.guest_client.get(
+            reverse('posts:comment_replies', kwargs={
+                'post_id': self.post.pk, 'comment_id': self.root.pk}),
+            {'cursor': replies.next_cursor})
+        self.assertEqual(list(response.context['replies']), [self.sibling])
+        self.assertFalse(response.context['replies'].has_next())
+
+    def test_reply_to_comment(self):
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый ответ', 'parent': self.other_root.pk})
+        reply = Comment.objects.get(text='Новый ответ')
+        self.assertEqual(reply.parent, self.other_root)
+        self.assertEqual(reply.depth, 1)
+
+    def test_cannot_reply_to_comment_of_other_post(self):
+        other_post = Post.objects.create(author=self.user, text='Другой')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': other_post.pk}),
+            data={'text': 'Чужой ответ', 'parent': self.root.pk})
+        self.assertFalse(Comment.objects.filter(text='Чужой ответ').exists())
+
+    def test_reply_link_fills_parent(self):
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            {'reply_to': self.root.pk})
+        self.assertContains(
+            response, f'name="parent" value="{self.root.pk}"')
+
+
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -332,3 +617,189 @@ class FollowViewsTest(TestCase):
             reverse('posts:follow_index'))
         new_post = len(response_follower.context['page_obj'])
         self.assertEqual(new_post, 0)
+
+    def test_timeline_filled_on_follow_and_new_post(self):
+        old_post = Post.objects.create(
+            author=FollowViewsTest.author, text='Старый пост')
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': FollowViewsTest.author.username}))
+        new_post = Post.objects.create(
+            author=FollowViewsTest.author, text='Новый пост')
+        timeline = TimelineEntry.objects.filter(user=FollowViewsTest.user)
+        self.assertEqual(
+            set(timeline.values_list('post_id', flat=True)),
+            {old_post.pk, new_post.pk})
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=FollowViewsTest.user2).exists())
+
+    def test_timeline_pruned_on_unfollow(self):
+        Follow.objects.create(
+            user=FollowViewsTest.user, author=FollowViewsTest.author)
+        Post.objects.create(author=FollowViewsTest.author, text='Пост')
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': FollowViewsTest.author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=FollowViewsTest.user).exists())
+
+    def test_rebuild_timelines_command(self):
+        Follow.objects.create(
+            user=FollowViewsTest.user, author=FollowViewsTest.author)
+        post = Post.objects.create(
+            author=FollowViewsTest.author, text='Пост')
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(FollowViewsTest.user.pk, post.pk)])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_popular_author_posts_merged_on_read(self):
+        Follow.objects.create(
+            user=FollowViewsTest.user, author=FollowViewsTest.author)
+        post = Post.objects.create(
+            author=FollowViewsTest.author, text='Пост популярного автора')
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_feed_merges_timeline_with_pull_authors(self):
+        quiet = User.objects.create_user(username='quiet')
+        for author in (FollowViewsTest.author, quiet):
+            Follow.objects.create(user=FollowViewsTest.user, author=author)
+        # Второй подписчик переводит автора в режим «на чтении»
+        Follow.objects.create(
+            user=FollowViewsTest.user2, author=FollowViewsTest.author)
+        Post.objects.bulk_create([
+            Post(author=(FollowViewsTest.author, quiet)[number % 3 == 0],
+                 text=f'Пост {number}') for number in range(25)])
+        for post in Post.objects.filter(author=quiet):
+            timelines.fan_out_post(post)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        feed = timelines.feed_for(FollowViewsTest.user)
+        self.assertIsInstance(feed, timelines.MergedFeed)
+        self.assertEqual(feed.count(), 25)
+        self.assertEqual(feed[10:20], expected[10:20])
+        pages = []
+        url = reverse('posts:follow_index')
+        for number in (1, 2, 3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url, {'page': number})
+            self.assertLessEqual(len(queries), resolve(url).func.query_budget)
+            pages.extend(response.context['page_obj'])
+        self.assertEqual(pages, expected)
+        with override_settings(PAGINATION_MODES={'follow_index': 'cursor'}):
+            pages, cursor_token = [], None
+            while True:
+                page = self.authorized_client.get(
+                    reverse('posts:follow_index'),
+                    {'cursor': cursor_token} if cursor_token else {},
+                ).context['page_obj']
+                pages.extend(page)
+                if not page.has_next():
+                    break
+                cursor_token = page.next_cursor
+            self.assertEqual(pages, expected)
+            previous = self.authorized_client.get(
+                reverse('posts:follow_index'),
+                {'cursor': page.previous_cursor}).context['page_obj']
+            self.assertEqual(list(previous), expected[10:20])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_author_below_threshold_gets_fanned_out_again(self):
+        Follow.objects.create(
+            user=FollowViewsTest.user, author=FollowViewsTest.author)
+        Follow.objects.create(
+            user=FollowViewsTest.user2, author=FollowViewsTest.author)
+        post = Post.objects.create(
+            author=FollowViewsTest.author, text='Пост популярного автора')
+        self.assertFalse(TimelineEntry.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client2.get(reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': FollowViewsTest.author.username}))
+        # Отписка не раскладывает посты: автор остаётся «на чтении»
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(any('INSERT' in query['sql']
+                             and 'timelineentry' in query['sql']
+                             for query in queries))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        call_command('settle_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(FollowViewsTest.user.pk, post.pk)])
+        self.assertFalse(UserCounter.objects.get(
+            user=FollowViewsTest.author).timeline_pull)
+        new_post = Post.objects.create(
+            author=FollowViewsTest.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=FollowViewsTest.user, post=new_post).exists())
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        authors = [User.objects.create_user(username=f'author{number}')
+                   for number in range(3)]
+        groups = [Group.objects.create(title=f'Группа {number}',
+                                       slug=f'group-{number}',
+                                       description='Описание')
+                  for number in range(3)]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for number in range(12):
+            post = Post.objects.create(author=authors[number % 3],
+                                       group=groups[number % 3],
+                                       text=f'Пост {number}')
+            for commenter in authors:
+                comment = Comment.objects.create(
+                    post=post, author=commenter, text='Комментарий')
+                Comment.objects.create(post=post, author=commenter,
+                                       text='Ответ', parent=comment)
+        cls.post = post
+        cls.comment = comment
+        cls.group = groups[0]
+        cls.author = authors[0]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_views_fit_query_budget(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryBudgetTests.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': QueryBudgetTests.author.username}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': QueryBudgetTests.post.pk}),
+            reverse('posts:post_comments',
+                    kwargs={'post_id': QueryBudgetTests.post.pk}),
+            reverse('posts:comment_replies',
+                    kwargs={'post_id': QueryBudgetTests.post.pk,
+                            'comment_id': QueryBudgetTests.comment.pk}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                budget = resolve(url).func.query_budget
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertLessEqual(len(queries), budget)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_query_count(self):
+        # Адрес вне INTERNAL_IPS, чтобы не включалась debug-панель
+        response = self.authorized_client.get(
+            reverse('posts:index'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response['X-Query-Budget'],
+                         str(settings.QUERY_BUDGETS['index']))
+        self.assertLessEqual(int(response['X-Query-Count']),
+                             settings.QUERY_BUDGETS['index'])
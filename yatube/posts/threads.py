@@ -0,0 +1,117 @@
+"""Ветки комментариев на материализованном пути.
+
+Comment.path — сегменты id предков и самого комментария в base36
+фиксированной ширины. Сортировка по path даёт обход ветки в глубину,
+а все ответы в ветке лежат одним диапазоном индекса (post, path):
+строго после пути корня и до пути корня с PATH_END на конце.
+Ни рекурсивных запросов, ни запроса на каждый уровень.
+"""
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import Window
+from django.db.models.functions import RowNumber, Substr
+
+from .models import (PATH_END, PATH_SEGMENT, Comment, path_segment,
+                     thread_position)
+from .paginators import CursorPage, CursorPaginator
+
+# path уникален, поэтому годится как ключ курсора сам по себе
+REPLY_ORDERING = ('path',)
+
+
+def subtree(comment):
+    """Условие на ответы в ветке comment, без него самого."""
+    return Q(post_id=comment.post_id,
+             path__gt=comment.path,
+             path__lt=comment.path + PATH_END)
+
+
+def replies_page(root, per_page, cursor=None):
+    """Страница ответов в ветке root в порядке обхода."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(subtree(root)).select_related('author'),
+        per_page, REPLY_ORDERING)
+    return paginator.get_page(cursor)
+
+
+def attach_replies(roots, per_page):
+    """Кладёт в root.replies первую страницу ответов каждой ветки.
+
+    Все ветки читаются одним запросом: ROW_NUMBER() по корню пути
+    отсекает лишние ответы ещё в БД, и длинная ветка целиком не
+    читается.
+    """
+    roots = list(roots)
+    condition = Q()
+    for root in roots:
+        condition |= subtree(root)
+    found = {}
+    if roots:
+        ranked = Comment.objects.filter(condition).order_by().annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[Substr('path', 1, PATH_SEGMENT)],
+                order_by=F('path').asc(),
+            )).values('pk', 'position')
+        sql, params = ranked.query.sql_with_params()
+        quote = connection.ops.quote_name
+        # pk__in=RawSQL(...) дал бы IN ((SELECT …)), а это в SQLite
+        # сравнение с одним первым значением
+        first = (f'{quote(Comment._meta.db_table)}.{quote("id")} IN '
+                 f'(SELECT {quote("id")} FROM ({sql}) AS ranked '
+                 f'WHERE {quote("position")} <= %s)')
+        replies = Comment.objects.extra(
+            where=[first], params=(*params, per_page + 1)
+        ).select_related('author').order_by(*REPLY_ORDERING)
+        for reply in replies:
+            found.setdefault(reply.path[:PATH_SEGMENT], []).append(reply)
+    paginator = CursorPaginator(Comment.objects.none(), per_page,
+                                REPLY_ORDERING)
+    for root in roots:
+        items = found.get(root.path, [])
+        next_cursor = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            next_cursor = paginator.encode_cursor(items[-1], paginator.NEXT)
+        root.replies_page = CursorPage(items, paginator, next_cursor)
+    return roots
+
+
+def fill_paths(batch_size=1000):
+    """Заполняет path и depth комментариев, созданных мимо save().
+
+    bulk_create не возвращает id, поэтому загрузка пишет комментарии
+    без пути. Пути достраиваются проходами по возрастанию id: каждый
+    проход заполняет тех, у чьих родителей путь уже есть, и листает
+    таблицу по ключу, не возвращаясь к началу. Ответ обычно моложе
+    родителя, так что чаще всего хватает одного прохода; следующий
+    нужен, только если в предыдущем что-то заполнилось. Слишком
+    глубокие ответы переносятся, как в Comment.save(). Возвращает
+    число заполненных.
+    """
+    pending = Comment.objects.filter(path='').filter(
+        Q(parent=None) | ~Q(parent__path='')).select_related(
+        'parent').only('parent', 'parent__parent', 'parent__path',
+                       'parent__depth').order_by('pk')
+    filled = 0
+    while True:
+        filled_in_pass = 0
+        last_pk = 0
+        while True:
+            changed = list(pending.filter(pk__gt=last_pk)[:batch_size])
+            if not changed:
+                break
+            for comment in changed:
+                parent_path = ''
+                if comment.parent is None:
+                    comment.depth = 0
+                else:
+                    comment.parent_id, parent_path, comment.depth = (
+                        thread_position(comment.parent))
+                comment.path = parent_path + path_segment(comment.pk)
+            Comment.objects.bulk_update(changed, ['parent', 'path', 'depth'])
+            filled_in_pass += len(changed)
+            last_pk = changed[-1].pk
+        if not filled_in_pass:
+            return filled
+        filled += filled_in_pass
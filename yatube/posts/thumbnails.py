@@ -0,0 +1,203 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Раньше первая страница с новой картинкой сама резала кадр 960x339
+внутри {% thumbnail %}. Теперь при сохранении картинки все размеры из
+POST_THUMBNAILS ставятся в очередь пула потоков, а шаблон только
+смотрит в хранилище ключей sorl-thumbnail: пока миниатюры нет, он
+выводит оригинал и не генерирует ничего сам.
+
+Для страницы ленты prefetch() достаёт записи о миниатюрах всех
+картинок одним get_many из кэша (и одним запросом к БД для промахов)
+до рендера карточек; число обращений видно в заголовке
+X-Thumbnail-Lookups (core.middleware).
+
+Кроме основной миниатюры 'card' из неё выводятся варианты для srcset:
+ширины POST_IMAGE_WIDTHS в форматах POST_IMAGE_FORMATS, которые умеют
+сохранять и Pillow, и sorl-thumbnail. Записи о готовых вариантах
+лежат в том же хранилище ключей, так что рендер их не ищет в storage.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.middleware import record_lookups
+
+from .cache import bump_feed_version
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'posts:thumbnail-pending:{}'
+# Сколько секунд не ставить повторно в очередь одну и ту же картинку
+PENDING_TIMEOUT = 5 * 60
+
+_executor = ThreadPoolExecutor(max_workers=settings.POST_THUMBNAIL_WORKERS,
+                               thread_name_prefix='thumbnails')
+
+
+@lru_cache(maxsize=None)
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, доступные в этой сборке Pillow."""
+    Image.init()
+    return tuple(fmt for fmt in settings.POST_IMAGE_FORMATS
+                 if fmt in EXTENSIONS and fmt in Image.SAVE)
+
+
+@lru_cache(maxsize=None)
+def variants():
+    """Варианты 'card' для srcset: {псевдоним: (формат, ширина)}."""
+    return {
+        f'card-{size}-{EXTENSIONS[fmt]}': (fmt, size)
+        for fmt in supported_formats()
+        for size in settings.POST_IMAGE_WIDTHS
+    }
+
+
+def card_aliases():
+    return ['card', *variants()]
+
+
+def _spec(alias):
+    if alias in settings.POST_THUMBNAILS:
+        options = dict(settings.POST_THUMBNAILS[alias])
+        return options.pop('geometry'), options
+    fmt, size = variants()[alias]
+    geometry, options = _spec('card')
+    width, height = map(int, geometry.split('x'))
+    options['format'] = fmt
+    return f'{size}x{round(size * height / width)}', options
+
+
+def _full_options(source, options):
+    # Те же умолчания, что подставляет ThumbnailBackend.get_thumbnail:
+    # от них зависит имя файла миниатюры.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, alias):
+    """ImageFile будущей миниатюры, без обращения к хранилищу."""
+    geometry, options = _spec(alias)
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _full_options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def _prefetched(image):
+    # Результаты prefetch живут на самом FieldFile, который модель
+    # держит у себя, поэтому доживают до рендера карточки
+    return image.__dict__.setdefault('_prefetched_thumbnails', {})
+
+
+def prefetch(images, aliases):
+    """Загружает записи о миниатюрах картинок пачкой.
+
+    Повторяет cached_db_kvstore.KVStore._get_raw, но для всех ключей
+    сразу: get_many из кэша sorl, затем один запрос к его таблице для
+    промахов; отсутствие миниатюры тоже кэшируется, как у sorl.
+    """
+    # Одному ключу могут соответствовать несколько пар: совпадающие
+    # варианты или одна картинка у разных постов
+    keys = {}
+    for image in images:
+        if not image:
+            continue
+        for alias in aliases:
+            if alias not in _prefetched(image):
+                key = add_prefix(thumbnail_file(image, alias).key)
+                keys.setdefault(key, []).append((image, alias))
+    if not keys:
+        return
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(list(keys))
+    lookups = 1
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStore.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+        lookups += 1
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    record_lookups('thumbnail', lookups)
+    for key, targets in keys.items():
+        value = values[key]
+        thumbnail = (None if value == EMPTY_VALUE
+                     else deserialize_image_file(value))
+        for image, alias in targets:
+            _prefetched(image)[alias] = thumbnail
+
+
+def cached_thumbnail(image, alias):
+    """Готовая миниатюра из хранилища ключей sorl или None."""
+    prefetched = _prefetched(image)
+    if alias not in prefetched:
+        prefetch([image], [alias])
+    return prefetched[alias]
+
+
+def ready(image):
+    """Готовы ли основная миниатюра и все варианты картинки."""
+    return all(cached_thumbnail(image, alias) for alias in card_aliases())
+
+
+def generate(name):
+    """Создаёт все миниатюры из POST_THUMBNAILS для файла name.
+
+    Возвращает False, если картинку обработать не удалось.
+    """
+    # Хранилище поля входит в ключ исходника, а значит и в имена миниатюр
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    try:
+        for alias in [*settings.POST_THUMBNAILS, *variants()]:
+            geometry, options = _spec(alias)
+            get_thumbnail(source, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', name)
+        return False
+    # Ленты с оригиналом вместо миниатюры пора перерисовать
+    bump_feed_version()
+    return True
+
+
+def _work(name):
+    try:
+        # После ошибки отметка остаётся до PENDING_TIMEOUT: битая
+        # картинка не встаёт в очередь заново с каждой страницей
+        if generate(name):
+            cache.delete(PENDING_KEY.format(name))
+    finally:
+        # Поток пула живёт долго: соединение с БД не должно висеть
+        connection.close()
+
+
+def schedule(name):
+    """Ставит картинку в очередь, если она ещё не там."""
+    if cache.add(PENDING_KEY.format(name), True, PENDING_TIMEOUT):
+        # Пул стартует после фиксации транзакции запроса: до неё файл
+        # может быть не нужен, а запись в хранилище ключей ждала бы
+        # блокировку SQLite
+        transaction.on_commit(lambda: _executor.submit(_work, name))
@@ -0,0 +1,255 @@
+"""Материализованные ленты подписок (fan-out on write).
+
+Каждый опубликованный пост копируется в ленты подписчиков автора,
+подписка дозаполняет ленту постами автора, отписка их удаляет.
+Лента подписок после этого — один диапазон по индексу
+TimelineEntry(user, -pub_date).
+
+Стратегия гибридная: посты авторов, у которых подписчиков больше
+TIMELINE_FANOUT_THRESHOLD, не раскладываются по лентам (это были бы
+сотни тысяч вставок на пост), а подмешиваются при чтении по индексу
+постов автора.
+
+Обратный переход дорогой: опустившегося до порога автора надо
+разложить всем его подписчикам. Поэтому отписка его не раскладывает,
+а только отмечает UserCounter.timeline_pull — автор остаётся «на
+чтении», пока команда settle_timelines не разложит его посты пачкой,
+вне запросов пользователей.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from . import counters
+from .models import Follow, Post, TimelineEntry, UserCounter
+
+# Порядок ленты подписок: поля аннотаций из feed_for
+FEED_ORDERING = ('-feed_date', '-feed_post_id')
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id,
+                         post_id=post.pk,
+                         author_id=post.author_id,
+                         pub_date=post.pub_date)
+
+
+def _insert(entries):
+    """Вставляет записи лент пачками по TIMELINE_BATCH_SIZE."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follower_count(author_id):
+    return counters.for_user(author_id).followers_count
+
+
+def is_pull_author(author_id):
+    """Посты автора подмешиваются при чтении, а не раскладываются."""
+    counter = counters.for_user(author_id)
+    return (counter.timeline_pull
+            or counter.followers_count > settings.TIMELINE_FANOUT_THRESHOLD)
+
+
+def pull_authors_for(user):
+    """Авторы из подписок читателя, чьи посты читаются без fan-out."""
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return list(
+        UserCounter.objects.filter(
+            Q(followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD)
+            | Q(timeline_pull=True),
+            user_id__in=followed)
+        .values_list('user_id', flat=True))
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True)
+                 .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE))
+    _insert(_entry(user_id, post) for user_id in followers)
+
+
+def _backfill(user_id, author_id):
+    posts = (Post.objects.filter(author_id=author_id)
+             .only('pk', 'author_id', 'pub_date')
+             .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE))
+    _insert(_entry(user_id, post) for post in posts)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    if not is_pull_author(author_id):
+        _backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+    if follower_count(author_id) == settings.TIMELINE_FANOUT_THRESHOLD:
+        # Автор только что опустился до порога. Раскладка его постов
+        # всем подписчикам прямо в запросе отписки — это до порога ×
+        # постов вставок, поэтому он остаётся «на чтении» до settle().
+        UserCounter.objects.filter(user_id=author_id).update(
+            timeline_pull=True)
+
+
+def settle():
+    """Раскладывает посты авторов, опустившихся до порога.
+
+    Каждый автор — отдельная транзакция: отметка снимается вместе
+    с последней вставкой, и до неё лента подписчиков читает его посты
+    напрямую. Возвращает число разложенных авторов.
+    """
+    authors = list(UserCounter.objects.filter(
+        timeline_pull=True,
+        followers_count__lte=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).values_list('user_id', flat=True))
+    for author_id in authors:
+        with transaction.atomic():
+            followers = (Follow.objects.filter(author_id=author_id)
+                         .values_list('user_id', flat=True)
+                         .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE))
+            for follower_id in followers:
+                _backfill(follower_id, author_id)
+            UserCounter.objects.filter(user_id=author_id).update(
+                timeline_pull=False)
+    return len(authors)
+
+
+def rebuild():
+    """Пересобирает все ленты с нуля по текущим подпискам."""
+    TimelineEntry.objects.all().delete()
+    # Ленты собираются заново, отложенная раскладка больше не нужна
+    UserCounter.objects.filter(timeline_pull=True).update(
+        timeline_pull=False)
+    follows = (Follow.objects.values_list('user_id', 'author_id')
+               .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE))
+    for user_id, author_id in follows:
+        backfill(user_id, author_id)
+
+
+def _timeline(user):
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post_id=F('timeline_entries__post_id'))
+
+
+def _authored(author_id):
+    return Post.objects.filter(author_id=author_id).annotate(
+        feed_date=F('pub_date'), feed_post_id=F('pk'))
+
+
+class MergedFeed:
+    """Лента подписок с авторами «на чтении».
+
+    Источники — сама лента без таких авторов и посты каждого из них —
+    не пересекаются. Страница [start:stop] читает из каждого не больше
+    stop строк его диапазоном индекса, а слияние этих кусков идёт в
+    одном запросе через UNION ALL. Общей сортировки всех постов ленты
+    и всех постов популярных авторов нет.
+
+    Повторяет ту часть интерфейса QuerySet, которой пользуются
+    Paginator, CursorPaginator и представление ленты.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, sources, ordering=FEED_ORDERING, related=()):
+        self.sources = list(sources)
+        self.ordering = tuple(ordering)
+        self.related = tuple(related)
+
+    @property
+    def query(self):
+        # Аннотации ключа у всех источников одинаковые
+        return self.sources[0].query
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            [source.filter(*args, **kwargs) for source in self.sources],
+            self.ordering, self.related)
+
+    def order_by(self, *ordering):
+        return MergedFeed(self.sources, ordering or FEED_ORDERING,
+                          self.related)
+
+    def select_related(self, *fields):
+        return MergedFeed(self.sources, self.ordering,
+                          self.related + fields)
+
+    def count(self):
+        counts = []
+        params = []
+        for source in self.sources:
+            sql, source_params = source.order_by().values(
+                'pk').query.sql_with_params()
+            counts.append(f'(SELECT COUNT(*) FROM ({sql}) AS source)')
+            params.extend(source_params)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {" + ".join(counts)}', params)
+            return cursor.fetchone()[0]
+
+    def page(self, start, stop):
+        """Запрос постов [start:stop] ленты, без сортировки."""
+        quote = connection.ops.quote_name
+        order = ', '.join(
+            f'{quote(field.lstrip("-"))} '
+            f'{"DESC" if field.startswith("-") else "ASC"}'
+            for field in self.ordering)
+        legs, params = [], []
+        for source in self.sources:
+            rows = source.order_by(*self.ordering).values(
+                'pk', 'feed_date', 'feed_post_id')[:stop]
+            sql, source_params = rows.query.sql_with_params()
+            legs.append(f'SELECT * FROM ({sql}) AS source')
+            params.extend(source_params)
+        where = (f'{quote(Post._meta.db_table)}.{quote("id")} IN '
+                 f'(SELECT {quote("id")} FROM '
+                 f'({" UNION ALL ".join(legs)}) AS merged '
+                 f'ORDER BY {order} LIMIT %s OFFSET %s)')
+        return Post.objects.select_related(*self.related).extra(
+            where=[where], params=(*params, stop - start, start),
+        ).order_by()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        posts = list(self.page(start, index.stop))
+        for post in posts:
+            # Дата в ленте — копия pub_date поста
+            post.feed_date, post.feed_post_id = post.pub_date, post.pk
+        posts.sort(key=lambda post: (post.feed_date, post.pk),
+                   reverse=self.ordering[0].startswith('-'))
+        return posts
+
+
+def merged_feed(user, pull_authors):
+    """Лента читателя с постами авторов pull_authors, см. MergedFeed."""
+    timeline = _timeline(user).exclude(author_id__in=pull_authors)
+    return MergedFeed(
+        [timeline, *(_authored(author_id) for author_id in pull_authors)])
+
+
+def feed_for(user):
+    """Посты ленты подписок читателя в порядке FEED_ORDERING.
+
+    Без авторов «на чтение» порядок берётся из самой ленты, и запрос
+    идёт диапазоном по индексу TimelineEntry без сортировки. Иначе
+    страница собирается из кусков ленты и постов таких авторов,
+    см. MergedFeed.
+    """
+    pull_authors = pull_authors_for(user)
+    if pull_authors:
+        return merged_feed(user, pull_authors)
+    return _timeline(user).order_by(*FEED_ORDERING)
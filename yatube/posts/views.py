@@ -1,16 +1,35 @@
+from http import HTTPStatus
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+
+from core.middleware import query_budget
 
+from . import (autocomplete, counters, export, freshness, search,
+               threads, thumbnails, timelines)
+from .cache import feed_cache_context
 from .forms import PostForm, CommentForm
 from .models import Group, Post, Comment, Follow
+from .paginators import CursorPaginator
+from .uploads import limit_image_uploads
 
 User = get_user_model()
 
 
-def paginator_post(posts_list, request):
+def paginator_post(posts_list, request, ordering=('-pub_date', '-pk')):
+    # Режим пагинации выбирается по имени маршрута в PAGINATION_MODES
+    view_name = getattr(request.resolver_match, 'url_name', None)
+    mode = settings.PAGINATION_MODES.get(view_name, 'offset')
+    if mode == 'cursor':
+        paginator = CursorPaginator(
+            posts_list, settings.COUNT_IN_PAGES, ordering)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(posts_list, settings.COUNT_IN_PAGES)
     page_number = request.GET.get('page')
     # Получаем набор записей для страницы с запрошенным номером
@@ -18,72 +37,140 @@ def paginator_post(posts_list, request):
     return page_obj
 
 
+# Новые комментарии сверху, как в Comment.Meta.ordering
+COMMENT_ORDERING = ('-created', '-pk')
+
+
+def comments_page(post_id, cursor=None):
+    # Корни веток отдаются порциями по ключу (created, id), а к каждому
+    # — первая порция ответов: популярный пост не тянет в страницу
+    # тысячи записей
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id, depth=0)
+        .select_related('author'),
+        settings.COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    page = paginator.get_page(cursor)
+    threads.attach_replies(page, settings.COMMENT_REPLIES_PER_PAGE)
+    return page
+
+
+@query_budget(settings.QUERY_BUDGETS['index'])
+@freshness.conditional_page(freshness.index_posts)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator_post(post_list, request)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(settings.QUERY_BUDGETS['group_posts'])
+@freshness.conditional_page(freshness.group_posts)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
+    # group.posts сам проставляет постам уже прочитанную группу, JOIN
+    # с ней не нужен
+    posts_list = group.posts.select_related('author')
     page_obj = paginator_post(posts_list, request)
     template = 'posts/group_list.html'
     context = {
         'posts': posts_list,
         'group': group,
         'page_obj': page_obj,
+        **feed_cache_context(),
     }
     return render(request, template, context)
 
 
+@query_budget(settings.QUERY_BUDGETS['profile'])
+@freshness.conditional_page(freshness.profile_posts)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    all_posts_user = author.posts.all()
+    all_posts_user = author.posts.select_related('group')
     page_obj = paginator_post(all_posts_user, request)
     template = 'posts/profile.html',
-    following = False
-    exist_follow = Follow.objects.filter(
-        user=request.user.is_authenticated,
-        author=author).exists()
-    if request.user != author and exist_follow:
-        following = True
+    following = (
+        request.user.is_authenticated
+        and request.user != author
+        and Follow.objects.filter(user=request.user, author=author).exists()
+    )
+    author_counters = counters.for_user(author.pk)
     context = {
         'page_obj': page_obj,
         'author': author,
+        'posts_count': author_counters.posts_count,
+        'followers_count': author_counters.followers_count,
+        'following_count': author_counters.following_count,
         'all_posts_user': all_posts_user,
         'following': following,
+        **feed_cache_context(),
     }
     return render(request, template, context)
 
 
+@query_budget(settings.QUERY_BUDGETS['post_detail'])
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    # Без JavaScript «Показать ещё» ведёт сюда же с ?comments=<курсор>
+    comments = comments_page(post.pk, request.GET.get('comments'))
     form = CommentForm(request.POST or None)
-    count_post = post.author.posts.all().count()
+    # «Ответить» ведёт сюда же с ?reply_to=<id комментария>
+    reply_to = request.GET.get('reply_to', '')
+    count_post = counters.for_user(post.author_id).posts_count
     context = {
         'post': post,
         'count_post': count_post,
         'form': form,
         'comments': comments,
+        'reply_to': int(reply_to) if reply_to.isdigit() else None,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(settings.QUERY_BUDGETS['post_comments'])
+def post_comments(request, post_id):
+    # Фрагмент для кнопки «Показать ещё»: следующая порция и кнопка
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post.pk, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@query_budget(settings.QUERY_BUDGETS['comment_replies'])
+def comment_replies(request, post_id, comment_id):
+    # Следующая порция ответов одной ветки
+    root = get_object_or_404(Comment.objects.only('path', 'post_id'),
+                             pk=comment_id, post_id=post_id)
+    context = {
+        'replies': threads.replies_page(
+            root, settings.COMMENT_REPLIES_PER_PAGE,
+            request.GET.get('cursor')),
+        'root': root,
+    }
+    return render(request, 'posts/includes/reply_list.html', context)
+
+
+@limit_image_uploads
 @login_required()
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None
+        files=request.FILES or None,
+        upload_errors=request.upload_errors
     )
     if form.is_valid():
         instance = form.save(commit=False)
         instance.author = request.user
         instance.save()
+        if instance.image:
+            # Миниатюры режутся в фоне, а не первым запросом ленты
+            thumbnails.schedule(instance.image.name)
         return redirect('posts:profile', instance.author)
     context = {
         'form': form,
@@ -92,6 +179,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@limit_image_uploads
 @login_required()
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -102,9 +190,12 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post)
+        instance=post,
+        upload_errors=request.upload_errors)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data and post.image:
+            thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {
@@ -116,30 +207,109 @@ def post_edit(request, post_id):
 
 
 @login_required()
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
+    # Ответить можно только на комментарий этого же поста
+    parent_id = request.POST.get('parent', '')
+    parent = None
+    if parent_id.isdigit():
+        parent = get_object_or_404(
+            Comment.objects.only('path', 'depth', 'parent_id'),
+            pk=parent_id, post=post)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = parent
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(settings.QUERY_BUDGETS['follow_index'])
 @login_required()
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user)
+    # Лента читается из материализованной таблицы, см. posts.timelines
+    post_list = timelines.feed_for(request.user).select_related(
+        'author', 'group')
 
-    page_obj = paginator_post(post_list, request)
+    page_obj = paginator_post(post_list, request, timelines.FEED_ORDERING)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(settings.QUERY_BUDGETS['search'])
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search.search_page(query, settings.COUNT_IN_PAGES,
+                                      request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(settings.QUERY_BUDGETS['search_api'])
+def search_api(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Пустой запрос'},
+                            status=HTTPStatus.BAD_REQUEST)
+    page_obj = search.search_page(query, settings.COUNT_IN_PAGES,
+                                  request.GET.get('cursor'))
+    results = [{
+        'id': post.pk,
+        'url': reverse('posts:post_detail', args=(post.pk,)),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'pub_date': post.pub_date.isoformat(),
+        'rank': post.search_rank,
+        'snippet': post.search_snippet,
+    } for post in page_obj]
+    return JsonResponse({'results': results,
+                         'next_cursor': page_obj.next_cursor})
+
+
+@query_budget(settings.QUERY_BUDGETS['autocomplete'])
+def autocomplete_api(request):
+    prefix = request.GET.get('q', '').strip()
+    if not prefix:
+        return JsonResponse({'authors': [], 'groups': []})
+    found = autocomplete.suggest(prefix, settings.AUTOCOMPLETE_LIMIT)
+    return JsonResponse({
+        'authors': [{
+            'username': username,
+            'url': reverse('posts:profile', args=(username,)),
+        } for username in found['authors']],
+        'groups': [{
+            'slug': slug,
+            'title': title,
+            'url': reverse('posts:group_list', args=(slug,)),
+        } for slug, title in found['groups']],
+    })
+
+
+@login_required()
+def profile_export(request, username):
+    # Архив только своих записей; отдаётся по мере сборки
+    if request.user.username != username:
+        return redirect('posts:profile', username=username)
+    response = StreamingHttpResponse(export.archive(request.user),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{username}.zip"')
+    return response
+
+
 @login_required()
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -150,6 +320,7 @@ def profile_follow(request, username):
 
 
 @login_required()
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -146,11 +148,100 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 COUNT_IN_PAGES = 10
+# Комментариев в одной порции на странице поста
+COMMENTS_PER_PAGE = 20
+# Ответов ветки в одной порции и наибольшая глубина вложенности
+COMMENT_REPLIES_PER_PAGE = 5
+COMMENT_MAX_DEPTH = 3
+# Сколько секунд прокси и CDN могут отдавать гостевые страницы лент
+# без перепроверки ETag (posts.freshness)
+FEED_HTTP_MAX_AGE = 60
+# Записей в RSS/Atom-лентах (posts.feeds)
+FEED_ITEMS = 20
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Строк за одно чтение БД при выгрузке архива автора (posts.export)
+EXPORT_BATCH_SIZE = 500
+
+# Режим пагинации лент по имени маршрута: 'offset' — номера страниц
+# (Paginator, COUNT(*) и OFFSET), 'cursor' — ключ (pub_date, id)
+# с токенами соседних страниц, глубокие страницы не дороже первой.
+PAGINATION_MODES = {
+    'index': 'offset',
+    'group_list': 'offset',
+    'profile': 'offset',
+    'follow_index': 'offset',
+}
+
+# Размер пачки вставок при раскладке постов по лентам подписок
+TIMELINE_BATCH_SIZE = 1000
+# Авторы с большим числом подписчиков не раскладываются по лентам,
+# их посты подмешиваются в ленту при чтении
+TIMELINE_FANOUT_THRESHOLD = 5000
+
+# Время жизни фрагментов лент в кэше; свежесть после записи
+# обеспечивает версия в ключе (posts.cache), а не короткий TTL
+FEED_CACHE_TIMEOUT = 60 * 60
+# Карточки постов версионируются содержимым, поэтому живут сутки
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры картинок постов (posts.thumbnails): готовятся в фоне при
+# сохранении картинки, шаблоны берут их по имени
+POST_THUMBNAILS = {
+    'card': {'geometry': '960x339', 'crop': 'center', 'upscale': True},
+}
+POST_THUMBNAIL_WORKERS = 2
+# Варианты 'card' для srcset: ширины и форматы по убыванию
+# предпочтения; форматы, которые не умеет сохранять Pillow, пропускаются
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+# Загрузка картинки обрывается по размеру файла и по разрешению из
+# заголовка (posts.uploads); большие стороны уменьшаются при сохранении
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Бюджет SQL-запросов на страницу (core.middleware.QueryBudgetMiddleware
+# проверяет его в DEBUG, тесты — всегда). Учитывает сессию и пользователя.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_posts': 5,
+    'profile': 7,
+    'post_detail': 6,
+    'post_comments': 5,
+    'comment_replies': 4,
+    'follow_index': 5,
+    'search': 4,
+    'search_api': 4,
+    'autocomplete': 2,
+    'feeds': 3,
+    'api': 4,
+}
+
+# Движок полнотекстового поиска (posts.search)
+POST_SEARCH_BACKEND = 'posts.search.sqlite.FTS5Backend'
+# Подсказок каждого вида в ответе автодополнения (posts.autocomplete)
+AUTOCOMPLETE_LIMIT = 10
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Общий для всех воркеров хоста кэш в SQLite (WAL), см.
+# core.cache_backends.sqlite; LocMemCache у каждого процесса свой.
+# Файл лежит вне дерева исходников, путь задаёт YATUBE_CACHE_LOCATION.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }
+
+# Тестам — кэш в памяти процесса, см. core.runner
+TEST_RUNNER = 'core.runner.TestRunner'